@@ -24,11 +24,13 @@ import gi
 gi.require_version('Gdk', '3.0')
 gi.require_version('Gtk', '3.0')
 from gi.repository import Gdk
+from gi.repository import Gio
 from gi.repository import Gtk
 from gi.repository import GObject
 import os
 import re
 
+import copy
 import json
 
 import locale
@@ -64,6 +66,8 @@ from readers import MeasureReader
 from readers import ClipboardReader
 import charthelp
 import chart as charts
+import rendercache
+import renderthread
 
 # Mime types
 _STOPWATCH_MIME_TYPE = 'application/x-stopwatch-activity'
@@ -82,6 +86,8 @@ TICK_FONT = 'ticks'
 # Paths
 _ACTIVITY_DIR = os.path.join(activity.get_activity_root(), 'data/')
 _CHART_FILE = utils.get_chart_file(_ACTIVITY_DIR)
+_RENDER_CACHE_DIR = os.path.join(_ACTIVITY_DIR, 'render-cache')
+_RENDER_CACHE_SIZE = 32 * 1024 * 1024
 
 # Logging
 _logger = logging.getLogger('chart-activity')
@@ -150,6 +156,9 @@ class ChartArea(Gtk.DrawingArea):
                         Gdk.EventMask.VISIBILITY_NOTIFY_MASK)
         self.connect('draw', self._draw_cb)
 
+        self.set_has_tooltip(True)
+        self.connect('query-tooltip', self._query_tooltip_cb)
+
         self.drag_dest_set_target_list(Gtk.TargetList.new([]))
         self.drag_dest_add_text_targets()
         self.connect('drag_data_received', self._drag_data_received)
@@ -162,21 +171,38 @@ class ChartArea(Gtk.DrawingArea):
         context.set_source_rgb(255, 255, 255)
         context.fill()
 
-        if self._parent.current_chart is None:
+        chart = self._parent.current_chart
+        if chart is None or chart.surface is None:
             return
 
-        # Paint the chart:
-        chart_width = self._parent.current_chart.width
-        chart_height = self._parent.current_chart.height
+        # Paint the chart, the surface is the last one rendered and keeps
+        # its size until a new one is ready
+        chart_width = chart.surface.get_width()
+        chart_height = chart.surface.get_height()
 
         cxpos = alloc.width / 2 - chart_width / 2
         cypos = alloc.height / 2 - chart_height / 2
 
-        context.set_source_surface(self._parent.current_chart.surface,
-                                   cxpos,
-                                   cypos)
+        context.set_source_surface(chart.surface, cxpos, cypos)
         context.paint()
 
+    def _query_tooltip_cb(self, widget, x, y, keyboard_mode, tooltip):
+        chart = self._parent.current_chart
+        if chart is None or chart.surface is None:
+            return False
+
+        alloc = self.get_allocation()
+        cxpos = alloc.width / 2 - chart.surface.get_width() / 2
+        cypos = alloc.height / 2 - chart.surface.get_height() / 2
+
+        value = chart.get_value_at(x - cxpos, y - cypos)
+        if value is None:
+            return False
+
+        label, yval = value
+        tooltip.set_text('%s: %s' % (label, locale.str(yval)))
+        return True
+
     def _drag_data_received(self, w, context, x, y, data, info, time):
         if data and data.format == 8:
             io_file = StringIO(data.data)
@@ -206,18 +232,18 @@ class ChartActivity(activity.Activity):
         self.charts_area = None
         self.chart_data = []
         self.chart_type_buttons = []
-        self._font_options = {
-            'titleColor': '#000000',
-            'titleFont': 'Sans',
-            'titleFontSize': 12,
-            'axis': {
-                'tickFont': 'Sans',
-                'tickFontSize': 12,
-                'tickColor': '#000000',
-                'labelFontSize': 14,
-                'labelColor': '#666666',
-                'labelFont': 'Sans',
-                'lineColor': '#b3b3b3'}}
+        self._render_cache = rendercache.RenderCache(_RENDER_CACHE_DIR,
+                                                     _RENDER_CACHE_SIZE)
+        self._render_thread = renderthread.RenderThread()
+        self._render_scheduler = renderthread.RenderScheduler(
+            self._render_chart_now)
+        self._font_options = copy.deepcopy(charts.DEFAULT_FONT_OPTIONS)
+
+        # Gio.MemoryMonitor is new in GLib 2.64
+        if hasattr(Gio, 'MemoryMonitor'):
+            self._memory_monitor = Gio.MemoryMonitor.dup_default()
+            self._memory_monitor.connect('low-memory-warning',
+                                         self._low_memory_cb)
 
         # TOOLBARS
         self._labels_font = RadioToolButton()
@@ -678,7 +704,7 @@ class ChartActivity(activity.Activity):
         palette = button.get_palette()
         palette.popup(immediate=True)
 
-    def _add_value(self, widget, label='', value='0.0', bulk=False):
+    def _add_value(self, widget, label='', value='0.0'):
         before = len(self.chart_data)
 
         if label == '':
@@ -694,8 +720,7 @@ class ChartActivity(activity.Activity):
         if is_number:
             data = (label, float(value))
             if data not in self.chart_data:
-                pos = self.labels_and_values.add_value(
-                    label, value, bulk=bulk)
+                pos = self.labels_and_values.add_value(label, value)
                 self.chart_data.insert(pos, data)
                 self._show_chart_area()
                 self._update_chart_data()
@@ -703,6 +728,39 @@ class ChartActivity(activity.Activity):
         elif not is_number:
             _invalid_number_alert(activity)
 
+    def _add_values(self, rows):
+        '''Add (label, value) rows after the current data in one pass.
+
+           Rows already in the data and rows whose value is not a number
+           are left out. The table is filled and the chart is rendered
+           once, for all the rows.'''
+        known = set(self.chart_data)
+        new_data = []
+        texts = []
+        invalid = False
+        for label, value in rows:
+            if label == '':
+                label = str(len(self.chart_data) + len(new_data) + 1)
+            try:
+                data = (label, float(value))
+            except (TypeError, ValueError):
+                _logger.debug('data (%s) not a number' % (str(value)))
+                invalid = True
+                continue
+            if data not in known:
+                known.add(data)
+                new_data.append(data)
+                texts.append([label, str(value)])
+
+        if invalid:
+            _invalid_number_alert(self)
+
+        if new_data:
+            self.labels_and_values.add_values(texts)
+            self.chart_data.extend(new_data)
+            self._show_chart_area()
+        self.update_chart()
+
     def _remove_value(self, widget):
         value = self.labels_and_values.remove_selected_value()
         self.chart_data.remove(value)
@@ -712,7 +770,11 @@ class ChartActivity(activity.Activity):
         if not widget.get_active():
             return
 
+        previous = self.current_chart
         self.current_chart = charts.Chart(type)
+        if previous is not None:
+            # shown until the chart of the new type is rendered
+            self.current_chart.surface = previous.surface
 
         def update_btn():
             if (type == charts.PIE and
@@ -725,6 +787,13 @@ class ChartActivity(activity.Activity):
 
         self.update_chart()
 
+    def _low_memory_cb(self, monitor, level):
+        self._render_thread.release_memory()
+        if self.current_chart is not None:
+            self.current_chart.release_memory()
+        else:
+            charts.surface_pool.clear()
+
     def _configure_cb(self, event=None):
         # If we have room, put buttons on the main toolbar
         if Gdk.Screen.width() / 14 > style.GRID_CELL_SIZE:
@@ -754,6 +823,12 @@ class ChartActivity(activity.Activity):
         activity.Activity.fullscreen(self)
 
     def _render_chart(self, fullscreen=False):
+        # sliders and typing ask for a render on every change, only the
+        # last request of each frame is drawn
+        self._render_scheduler.request(fullscreen)
+        return False
+
+    def _render_chart_now(self, fullscreen):
         if not self.chart_data:
             self._show_empty_widgets()
             return
@@ -761,38 +836,45 @@ class ChartActivity(activity.Activity):
         if self.current_chart is None or self.charts_area is None:
             return
 
-        try:
-            # Resize the chart for all the screen sizes
-            alloc = self.get_allocation()
-
-            if fullscreen:
-                new_width = alloc.width
-                new_height = alloc.height
-                self.current_chart.width = alloc.width
-                self.current_chart.height = alloc.height
-            if not fullscreen:
-                alloc = self.charts_area.get_allocation()
-                new_width = alloc.width - 40
-                new_height = alloc.height - 40
-            self.current_chart.width = new_width
-            self.current_chart.height = new_height
-
-            # Set options
-            self.current_chart.set_color_scheme(color=self.chart_color)
-            self.current_chart.set_line_color(self.chart_line_color)
-            self.current_chart.set_font_options(self._font_options)
-
-            if self.current_chart.type == charts.PIE:
-                self.current_chart.render(self)
-            else:
-                self.current_chart.render()
-            self.charts_area.queue_draw()
+        # Resize the chart for all the screen sizes
+        alloc = self.get_allocation()
 
-        except (ZeroDivisionError, ValueError):
-            pass
+        if fullscreen:
+            new_width = alloc.width
+            new_height = alloc.height
+            self.current_chart.width = alloc.width
+            self.current_chart.height = alloc.height
+        if not fullscreen:
+            alloc = self.charts_area.get_allocation()
+            new_width = alloc.width - 40
+            new_height = alloc.height - 40
+        self.current_chart.width = new_width
+        self.current_chart.height = new_height
+
+        # Set options
+        self.current_chart.set_color_scheme(color=self.chart_color)
+        self.current_chart.set_line_color(self.chart_line_color)
+        self.current_chart.set_font_options(self._font_options)
+
+        # Draw a copy of the chart out of the main loop, the chart area
+        # keeps showing the previous surface until it is done
+        self._render_thread.render(self.current_chart.snapshot(),
+                                   self._chart_rendered, self.current_chart)
 
         self._show_chart_area()
-        return False
+
+    def _chart_rendered(self, snapshot, error, chart):
+        if chart is not self.current_chart:
+            # the chart type changed while it was drawn
+            return
+        chart.adopt(snapshot, failed=error is not None)
+        if error is None:
+            self.charts_area.queue_draw()
+
+        stats = self._render_scheduler.stats()
+        _logger.debug('%d renders requested, %d skipped',
+                      stats['requested'],
+                      stats['skipped'] + self._render_thread.skipped)
 
     def _update_chart_active_button(self, type=None):
         if self.current_chart is None and type is None:
@@ -945,11 +1027,7 @@ class ChartActivity(activity.Activity):
         self.h_label.entry.set_text(vertical)
 
         # Load the data
-        for row in chart_data:
-            self._add_value(
-                None, label=row[0], value=str(row[1]), bulk=True)
-
-        self.update_chart()
+        self._add_values(chart_data)
 
     def __import_stopwatch_cb(self, widget):
         matches_mime_type, file_path, title = \
@@ -975,15 +1053,30 @@ class ChartActivity(activity.Activity):
 
     def _save_as_image(self, widget):
         if self.current_chart:
-            jobject = datastore.create()
+            # drawn again, out of the main loop: the surface on screen may
+            # be older than the chart options
+            self._render_thread.render_png(self.current_chart.snapshot(),
+                                           self._render_cache,
+                                           self._image_rendered,
+                                           self.metadata['title'])
+
+    def _image_rendered(self, image, error, title):
+        if error is not None:
+            return
 
-            jobject.metadata['title'] = self.metadata['title'] + " Image"
-            jobject.metadata['mime_type'] = 'image/png'
+        jobject = datastore.create()
 
-            self.current_chart.as_png(_CHART_FILE)
-            jobject.set_file_path(_CHART_FILE)
+        jobject.metadata['title'] = title + " Image"
+        jobject.metadata['mime_type'] = 'image/png'
+
+        f = open(_CHART_FILE, 'wb')
+        try:
+            f.write(image)
+        finally:
+            f.close()
+        jobject.set_file_path(_CHART_FILE)
 
-            datastore.write(jobject)
+        datastore.write(jobject)
 
     def load_from_file(self, f):
         try:
@@ -1019,11 +1112,7 @@ class ChartActivity(activity.Activity):
             self.v_label.entry.set_text(self.y_label)
 
         # load the data
-        for row in chart_data:
-            self._add_value(
-                None, label=row[0], value=str(row[1]), bulk=True)
-
-        self.update_chart()
+        self._add_values(chart_data)
 
     def write_file(self, file_path):
         self.metadata['mime_type'] = 'application/x-chart-activity'
@@ -1098,7 +1187,7 @@ class ChartData(Gtk.TreeView):
 
         self.show_all()
 
-    def add_value(self, label, value, bulk=False):
+    def add_value(self, label, value):
         treestore, selected = self._selection.get_selected()
         if not selected:
             path = 0
@@ -1106,14 +1195,11 @@ class ChartData(Gtk.TreeView):
         elif selected:
             path = int(str(self.model.get_path(selected))) + 1
 
-        if bulk:
-            _iter = self.model.append([label, value])
-        else:
-            _iter = self.model.insert(path, [label, value])
+        _iter = self.model.insert(path, [label, value])
 
         self.set_cursor(self.model.get_path(_iter),
                         self.get_column(1),
-                        not bulk)
+                        True)
 
         self._items_count += 1
 
@@ -1121,6 +1207,19 @@ class ChartData(Gtk.TreeView):
 
         return path
 
+    def add_values(self, rows):
+        '''Append (label, value text) rows. The view is detached from the
+           model while they are added, so it is updated once'''
+        self.set_model(None)
+        for row in rows:
+            _iter = self.model.append(row)
+        self.set_model(self.model)
+
+        self.set_cursor(self.model.get_path(_iter), self.get_column(1), False)
+        self._items_count += len(rows)
+
+        _logger.info('Added %d values' % len(rows))
+
     def remove_selected_value(self):
         model, iter = self._selection.get_selected()
         value = (self.model.get(iter, 0)[0],
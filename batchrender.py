@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+'''Render Chart documents to PNG, SVG or PDF without a Sugar session.
+
+    python -m batchrender [-j JOBS] [-o OUTPUT_DIR] [-f FORMAT] INPUT...
+
+Every INPUT is a Chart document (the JSON ChartActivity.write_file saves),
+a directory of documents, a .jsonl file with one document per line or -
+to read documents lines from the standard input. The documents may have a
+'title' key with the title of the chart.
+
+The charts are rendered by a pool of processes and the time taken by
+every one is printed as it finishes. With --cache the PNG images are kept
+in a RenderCache directory and documents rendered before are just copied.
+SVG and PDF documents are written straight to their files. With
+--tile-size the PNG images are drawn in tiles, which keeps the memory low
+for very big images.
+'''
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import chart as charts
+import rendercache
+
+# RenderCache of the process, set by init_worker
+_cache = None
+
+
+FORMATS = ('png', 'svg', 'pdf')
+
+
+def iter_documents(inputs, output_dir, format='png'):
+    '''Yield a (name, text, output path) tuple for every document'''
+    for path in inputs:
+        if path == '-':
+            yield from _iter_lines('stdin', sys.stdin, output_dir, format)
+        elif os.path.isdir(path):
+            for entry in sorted(os.listdir(path)):
+                file_path = os.path.join(path, entry)
+                extension = os.path.splitext(entry)[1][1:]
+                if extension in FORMATS or not os.path.isfile(file_path):
+                    continue
+                with open(file_path) as f:
+                    yield (file_path, f.read(),
+                           _output_path(output_dir, entry, format))
+        elif path.endswith('.jsonl'):
+            with open(path) as f:
+                yield from _iter_lines(path, f, output_dir, format)
+        else:
+            with open(path) as f:
+                yield (path, f.read(), _output_path(
+                    output_dir, os.path.basename(path), format))
+
+
+def _iter_lines(name, f, output_dir, format):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    for number, line in enumerate(f, 1):
+        if line.strip():
+            yield ('%s:%d' % (name, number), line, _output_path(
+                output_dir, '%s-%d' % (stem, number), format))
+
+
+def _output_path(output_dir, name, format):
+    return os.path.join(output_dir, os.path.splitext(name)[0] + '.' + format)
+
+
+def init_worker(cache_dir, cache_size):
+    '''Open the render cache of the process, if any'''
+    global _cache
+    if cache_dir is not None:
+        _cache = rendercache.RenderCache(cache_dir, cache_size)
+
+
+def render_job(job):
+    '''Render the document of a job to its output path.
+       Return (name, output path, seconds, cached, error message or None)'''
+    name, text, output, width, height, format, tile_size = job
+    start = time.perf_counter()
+    cached = False
+    try:
+        data = json.loads(text)
+        chart = charts.from_document(data, width, height,
+                                     data.get('title', ''))
+        if format == 'png' and tile_size:
+            chart.render_tiled(output, tile_size)
+        elif format == 'png':
+            image, cached = rendercache.render_png(chart, _cache)
+            with open(output, 'wb') as f:
+                f.write(image)
+        else:
+            with open(output, 'wb') as f:
+                chart.export(f, format)
+    except Exception as error:
+        # a broken document must not stop the rest of the batch
+        return (name, output, time.perf_counter() - start, cached,
+                '%s: %s' % (type(error).__name__, error))
+    return name, output, time.perf_counter() - start, cached, None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m batchrender',
+        description='Render Chart documents to images.')
+    parser.add_argument('inputs', nargs='+', metavar='INPUT',
+                        help='document, directory, .jsonl file or -')
+    parser.add_argument('-o', '--output-dir', default='.',
+                        help='directory for the images (default: .)')
+    parser.add_argument('-j', '--jobs', type=int,
+                        default=os.cpu_count() or 1,
+                        help='number of processes (default: one per CPU)')
+    parser.add_argument('-f', '--format', choices=FORMATS, default='png',
+                        help='format of the images (default: png)')
+    parser.add_argument('--width', type=int, default=600)
+    parser.add_argument('--height', type=int, default=460)
+    parser.add_argument('--tile-size', type=int, default=0, metavar='PIXELS',
+                        help='draw PNG images in tiles of this size, '
+                             'without using the cache')
+    parser.add_argument('--cache', metavar='DIR',
+                        help='keep the PNG images in a cache directory')
+    parser.add_argument('--cache-size', type=int, default=512, metavar='MB',
+                        help='size limit of the cache (default: 512 MB)')
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    jobs = ((name, text, output, args.width, args.height, args.format,
+             args.tile_size)
+            for name, text, output in iter_documents(
+                args.inputs, args.output_dir, args.format))
+
+    start = time.perf_counter()
+    cache_args = (args.cache, args.cache_size * 1024 * 1024)
+    if args.jobs > 1:
+        with multiprocessing.Pool(args.jobs, init_worker, cache_args) as pool:
+            done, cached, failed = _report(
+                pool.imap_unordered(render_job, jobs))
+    else:
+        init_worker(*cache_args)
+        done, cached, failed = _report(map(render_job, jobs))
+
+    print('%d charts, %d from the cache, %d failed, %.2f s' % (
+        done, cached, failed, time.perf_counter() - start), file=sys.stderr)
+    return 1 if failed else 0
+
+
+def _report(results):
+    '''Print the results of the jobs, return (done, cached, failed) counts'''
+    done = cached = failed = 0
+    for name, output, seconds, hit, error in results:
+        done += 1
+        if error is None:
+            cached += hit
+            print('%8.1f ms  %s -> %s%s' % (seconds * 1000, name, output,
+                                            ' (cached)' if hit else ''))
+        else:
+            failed += 1
+            print('%8.1f ms  %s FAILED %s' % (seconds * 1000, name, error),
+                  file=sys.stderr)
+    return done, cached, failed
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -20,12 +20,19 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
 
+import collections
+import copy
+import hashlib
+import json
+import threading
+
 import sugarpycha.bar
 import sugarpycha.line
 import sugarpycha.pie
+from sugarpycha.dataset import Dataset
+import tiledrender
 
 import cairo
-from gi.repository import GObject
 
 # Chart types
 VERTICAL_BAR = 1
@@ -33,12 +40,103 @@ HORIZONTAL_BAR = 2
 LINE = 3
 PIE = 4
 
+_CHART_CLASSES = {
+    VERTICAL_BAR: sugarpycha.bar.VerticalBarChart,
+    HORIZONTAL_BAR: sugarpycha.bar.HorizontalBarChart,
+    LINE: sugarpycha.line.LineChart,
+    PIE: sugarpycha.pie.PieChart,
+}
 
-class Chart(GObject.GObject):
+# Surfaces of the formats export can write
+_VECTOR_SURFACES = {
+    'svg': cairo.SVGSurface,
+    'pdf': cairo.PDFSurface,
+}
 
-    def __init__(self, type=VERTICAL_BAR, width=600, height=460):
-        GObject.GObject.__init__(self)
+# Font options of the documents saved before they were configurable
+DEFAULT_FONT_OPTIONS = {
+    'titleColor': '#000000',
+    'titleFont': 'Sans',
+    'titleFontSize': 12,
+    'axis': {
+        'tickFont': 'Sans',
+        'tickFontSize': 12,
+        'tickColor': '#000000',
+        'labelFontSize': 14,
+        'labelColor': '#666666',
+        'labelFont': 'Sans',
+        'lineColor': '#b3b3b3'}}
+
+
+class SurfacePool(object):
+    '''Image surfaces released by the charts, kept to be reused by the
+       next renders of the same format and size.
+
+       At most per_size surfaces are kept for each size and max_bytes in
+       total; the sizes not used for longer are dropped first.'''
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, per_size=2):
+        self.max_bytes = max_bytes
+        self.per_size = per_size
+        self._free = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, format, width, height):
+        '''Return a clear surface, reused if the pool has one'''
+        key = (format, width, height)
+        with self._lock:
+            surfaces = self._free.get(key)
+            surface = surfaces.pop() if surfaces else None
+            if surface is not None:
+                self._bytes -= _surface_bytes(surface)
+
+        if surface is None:
+            return cairo.ImageSurface(format, width, height)
+
+        cx = cairo.Context(surface)
+        cx.set_operator(cairo.OPERATOR_CLEAR)
+        cx.paint()
+        return surface
+
+    def release(self, surface):
+        '''Give back a surface nothing draws or shows anymore'''
+        key = (surface.get_format(), surface.get_width(),
+               surface.get_height())
+        with self._lock:
+            surfaces = self._free.setdefault(key, [])
+            self._free.move_to_end(key)
+            if len(surfaces) >= self.per_size:
+                return
+            surfaces.append(surface)
+            self._bytes += _surface_bytes(surface)
 
+            while self._bytes > self.max_bytes:
+                key, surfaces = next(iter(self._free.items()))
+                if surfaces:
+                    self._bytes -= _surface_bytes(surfaces.pop(0))
+                else:
+                    del self._free[key]
+
+    def clear(self):
+        '''Drop every surface, for example when memory is low'''
+        with self._lock:
+            self._free.clear()
+            self._bytes = 0
+
+
+def _surface_bytes(surface):
+    return surface.get_stride() * surface.get_height()
+
+
+# Shared by the charts, the activity makes a new one for every chart type
+surface_pool = SurfacePool()
+
+
+class Chart(object):
+
+    def __init__(self, type=VERTICAL_BAR, width=600, height=460):
+        self.data = []
         self.dataSet = None
         self.options = None
         self.surface = None
@@ -47,12 +145,19 @@ class Chart(GObject.GObject):
         self.width = width
         self.height = height
 
+        self._chart = None
+        self._chart_type = None
+        self._labels = []
+        # lookup of the drawn items, see get_value_at
+        self._locator = None
+
     def data_set(self, data):
-        '''Set chart data (dataSet)'''
+        '''Set chart data (dataSet)
 
-        self.dataSet = (
-            ('Dots', [(i, l[1]) for i, l in enumerate(data)]),
-        )
+           The dataSet and the x ticks are built from the rows when the
+           chart is drawn, see _prepare'''
+        self.data = data
+        self.dataSet = None
 
         self.options = {
             'legend': {'hide': True},
@@ -68,8 +173,7 @@ class Chart(GObject.GObject):
                 'labelFont': 'Sans',
                 'lineColor': '#b3b3b3',
                 'x': {
-                    'ticks': [dict(v=i, label=l[0]) for i,
-                              l in enumerate(data)],
+                    'ticks': [],
                     'label': 'X',
                 },
                 'y': {
@@ -136,29 +240,180 @@ class Chart(GObject.GObject):
     def render(self, sg=None):
         '''Draw the chart
            Use the self.surface variable for show the chart'''
-        self.surface = cairo.ImageSurface(cairo.FORMAT_ARGB32,
-                                          self.width,
-                                          self.height)
+        # the previous surface may still be on screen, it goes back to
+        # the pool once the new one is drawn
+        previous = self.surface
+        self.surface = surface_pool.acquire(cairo.FORMAT_ARGB32,
+                                            self.width, self.height)
+        self._prepare(sg)
 
-        if self.type == VERTICAL_BAR:
-            chart = sugarpycha.bar.VerticalBarChart(self.surface, self.options)
+        # The sugarpycha chart is kept between renders, so the geometry and
+        # the layers drawn for the previous frame can be reused
+        if self._chart is None or self._chart_type != self.type:
+            self._chart = _CHART_CLASSES[self.type](self.surface,
+                                                    self.options)
+            self._chart.cacheLayers = True
+            self._chart_type = self.type
 
-        elif self.type == HORIZONTAL_BAR:
-            chart = sugarpycha.bar.HorizontalBarChart(self.surface,
-                                                      self.options)
+        self._chart.clearDatasets()
+        self._chart.addDataset(self.dataSet)
+        self._chart.render(self.surface, self.options)
+        self._locator = None
+        if previous is not None:
+            surface_pool.release(previous)
 
-        elif self.type == LINE:
-            chart = sugarpycha.line.LineChart(self.surface, self.options)
+    def release_memory(self):
+        '''Drop the pooled surfaces and the cached layers of the chart'''
+        surface_pool.clear()
+        if self._chart is not None:
+            self._chart.invalidateLayers()
 
-        elif self.type == PIE:
+    def _prepare(self, sg=None):
+        '''Build the dataSet, the labels and the x ticks from the rows.
+           Pie charts have a dataset and a legend entry for every row'''
+        chart_data = self.data if sg is None else sg.chart_data
+        self._labels = [row[0] for row in chart_data]
+        if self.type == PIE:
             self.options['legend'] = {'hide': 'False'}
-            chart = sugarpycha.pie.PieChart(self.surface, self.options)
             self.dataSet = [(data[0],
-                            [[0, data[1]]]) for data in sg.chart_data]
+                            [[0, data[1]]]) for data in chart_data]
+        else:
+            self.dataSet = (
+                Dataset('Dots', range(len(chart_data)),
+                        [row[1] for row in chart_data]),
+            )
+            self.options['axis']['x']['ticks'] = [
+                dict(v=i, label=label) for i, label in enumerate(self._labels)]
+
+    def snapshot(self):
+        '''Return a copy of the chart for another thread to render, which
+           later changes to this one don't affect'''
+        snapshot = Chart(self.type, self.width, self.height)
+        snapshot.data = tuple(self.data)
+        snapshot.options = _copy_options(self.options)
+        return snapshot
+
+    def render_with(self, charts):
+        '''Draw the chart with the sugarpycha chart of its type in charts,
+           a dict by chart type, and build its locator.
+
+           The render thread keeps the dict, so the geometry and the layers
+           of a render are reused by the next snapshots. Only the surface
+           and the locator are handed to adopt.'''
+        self._chart = charts.get(self.type)
+        self._chart_type = self.type if self._chart is not None else None
+        try:
+            self.render()
+            self.update_locator()
+        finally:
+            if self._chart is not None:
+                charts[self.type] = self._chart
+            self._chart = self._chart_type = None
 
+    def adopt(self, snapshot, failed=False):
+        '''Show the surface and use the locator of a rendered snapshot,
+           unless its render failed'''
+        if failed:
+            return
+
+        if self.surface is not None and self.surface is not snapshot.surface:
+            surface_pool.release(self.surface)
+        self.surface = snapshot.surface
+        self._labels = snapshot._labels
+        self._locator = snapshot._locator
+
+    def export(self, file, format='svg'):
+        '''Draw the chart as a SVG or PDF document written to file, a path
+           or a file object. Nothing is rasterized, and lines only keep
+           the points needed to draw them within half a pixel'''
+        surface = _VECTOR_SURFACES[format](file, self.width, self.height)
+        self._prepare()
+        options = dict(self.options)
+        if self.type == LINE:
+            options['downsample'] = {'mode': 'simplify', 'tolerance': 0.5}
+
+        # a chart of its own: the one kept for render caches raster layers
+        chart = _CHART_CLASSES[self.type](surface, options)
         chart.addDataset(self.dataSet)
         chart.render()
+        surface.finish()
+
+    def update_locator(self):
+        '''Build the lookup get_value_at uses for the last render. The
+           render thread calls it, so hovering never waits for it'''
+        self._locator = self._chart.getItemLocator()
+
+    def get_value_at(self, x, y):
+        '''Return the (label, value) drawn at the surface coordinate (x, y)
+           or None if there is no value there'''
+        if self._locator is None:
+            if self._chart is None:
+                return None
+            self.update_locator()
+
+        item = self._locator.getItemAt(x, y)
+        if item is None:
+            return None
+        if self.type == PIE:
+            return item.name, item.yval
+
+        index = int(round(item.xval))
+        if 0 <= index < len(self._labels):
+            return self._labels[index], item.yval
+        return '', item.yval
+
+    def render_tiled(self, file, tile_size=1024, processes=1):
+        '''Write the chart as a PNG image to file, a path or a file object,
+           without a surface of the whole size. The image is drawn in
+           tiles of tile_size pixels, by several worker processes if
+           processes is more than one'''
+        self._prepare()
+        if isinstance(file, str):
+            with open(file, 'wb') as f:
+                self.render_tiled(f, tile_size, processes)
+            return
+        tiledrender.write_png(file, _CHART_CLASSES[self.type], self.options,
+                              self.dataSet, self.width, self.height,
+                              tile_size, processes)
+
+    def cache_key(self, format='png'):
+        '''Return a digest of the data, options, type, size and format,
+           everything that changes the image of the chart'''
+        # the key must be the same before and after the chart is drawn
+        self._prepare()
+        options = self.options
+        document = [self.type, self.width, self.height, format,
+                    options, self.data]
+        text = json.dumps(document, sort_keys=True, default=str)
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
 
     def as_png(self, file):
         '''Save the chart as png image'''
         self.surface.write_to_png(file)
+
+
+def _copy_options(options):
+    '''Copy the dicts of options. The lists, like the x ticks, are always
+       replaced and never changed in place, so they can be shared'''
+    return dict((key, _copy_options(value) if isinstance(value, dict)
+                 else value) for key, value in options.items())
+
+
+def from_document(data, width=600, height=460, title=''):
+    '''Return a Chart ready to render the document data, a dict with the
+       keys ChartActivity.write_file saves'''
+    if not data['chart_data']:
+        raise ValueError('the document has no data')
+
+    chart = Chart(data['current_chart.type'], width, height)
+    chart.data_set([(row[0], float(row[1])) for row in data['chart_data']])
+    chart.set_title(title)
+    chart.set_x_label(data.get('x_label', ''))
+    chart.set_y_label(data.get('y_label', ''))
+    chart.set_color_scheme(color=data.get('chart_color', 'blue'))
+    chart.set_line_color(data.get('chart_line_color', '#000000'))
+    font_options = data.get('font_options')
+    if not font_options:
+        font_options = copy.deepcopy(DEFAULT_FONT_OPTIONS)
+    chart.set_font_options(font_options)
+    return chart
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import io
+import os
+import tempfile
+
+# Bump it when a change in the drawing code makes the cached images stale
+CACHE_VERSION = '1'
+
+_TEMP_PREFIX = '.tmp-'
+
+
+class RenderCache(object):
+    '''Directory of encoded chart images named by Chart.cache_key.
+
+       Files are written to a temporary name and renamed, so readers never
+       see half written images and several processes can share the
+       directory. When the files take more than max_size bytes the least
+       recently used ones are removed.'''
+
+    def __init__(self, directory, max_size=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = self.misses = self.writes = self.evictions = 0
+        # bytes used by the directory, counted on the first put
+        self._size = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        key = CACHE_VERSION + key
+        return os.path.join(self.directory, key[:3], key)
+
+    def get(self, key):
+        '''Return the image stored for key or None'''
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+
+        # the modification time orders the files for the eviction
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # evicted by another process since it was read
+            pass
+        return data
+
+    def put(self, key, data):
+        '''Store the image data for key'''
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=_TEMP_PREFIX)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            # an image stored again for the same key replaces the old one
+            try:
+                replaced = os.stat(path).st_size
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        self.writes += 1
+
+        if self._size is None:
+            self._size = sum(entry[1] for entry in self._entries())
+        else:
+            self._size += len(data) - replaced
+        if self._size > self.max_size:
+            self._evict()
+
+    def _entries(self):
+        for subdir in os.scandir(self.directory):
+            if not subdir.is_dir():
+                continue
+            for entry in os.scandir(subdir.path):
+                if entry.name.startswith(_TEMP_PREFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # removed by another process
+                    continue
+                yield entry.path, stat.st_size, stat.st_mtime
+
+    def _evict(self):
+        # go down to 90% so the next puts don't scan the directory again
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        size = sum(entry[1] for entry in entries)
+        limit = self.max_size * 0.9
+        for path, entry_size, mtime in entries:
+            if size <= limit:
+                break
+            try:
+                os.unlink(path)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+        self._size = size
+
+    def stats(self):
+        '''Return the counters of this cache object'''
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'writes': self.writes,
+            'evictions': self.evictions,
+            'hit_ratio': self.hits / float(lookups) if lookups else 0.0,
+        }
+
+
+def render_png(chart, cache=None, rendered=False):
+    '''Return (PNG image, True if it came from the cache) for a Chart.
+
+       On a miss the chart is rendered, unless rendered says its surface
+       already shows the current data and options.'''
+    key = None
+    if cache is not None:
+        key = chart.cache_key('png')
+        image = cache.get(key)
+        if image is not None:
+            return image, True
+
+    if not rendered:
+        chart.render()
+    f = io.BytesIO()
+    chart.as_png(f)
+    image = f.getvalue()
+    if cache is not None:
+        cache.put(key, image)
+    return image, False
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+'''Long running HTTP service that renders Chart documents to PNG images.
+
+    python -m renderservice [--port PORT | --socket PATH] [-j WORKERS]
+
+POST /render?width=W&height=H with a Chart document (the JSON
+ChartActivity.write_file saves) as the body answers the PNG image.
+GET /metrics answers the request counters and latencies as JSON.
+
+The charts are rendered by a pool of processes that have cairo and
+sugarpycha already imported. At most --queue requests wait for a worker,
+the rest are answered 503 at once so clients can back off.
+'''
+
+import argparse
+import collections
+import http.server
+import io
+import json
+import multiprocessing
+import os
+import socketserver
+import sys
+import threading
+import time
+import urllib.parse
+
+import chart as charts
+
+_WARM_DOCUMENT = {
+    'current_chart.type': charts.VERTICAL_BAR,
+    'chart_data': [['a', 1.0], ['b', 2.0]],
+}
+
+
+def _warm_worker():
+    '''Render a chart once so the first request of a worker finds the
+       fonts and the cairo caches loaded'''
+    render_document(_WARM_DOCUMENT, 64, 64)
+
+
+def render_document(data, width, height):
+    '''Return (PNG bytes, seconds) of the chart of a document'''
+    start = time.perf_counter()
+    chart = charts.from_document(data, width, height, data.get('title', ''))
+    chart.render()
+    image = io.BytesIO()
+    chart.as_png(image)
+    return image.getvalue(), time.perf_counter() - start
+
+
+class RenderMetrics(object):
+
+    '''Request counters and the latencies of the latest requests'''
+
+    window = 1024
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = collections.Counter()
+        self.latencies = collections.deque(maxlen=self.window)
+        self.render_times = collections.deque(maxlen=self.window)
+        self.in_flight = 0
+
+    def start(self):
+        with self._lock:
+            self.counters['requests'] += 1
+            self.in_flight += 1
+
+    def finish(self, status, latency, render_time=None):
+        with self._lock:
+            self.in_flight -= 1
+            self.counters[status] += 1
+            self.latencies.append(latency)
+            if render_time is not None:
+                self.render_times.append(render_time)
+
+    def snapshot(self):
+        with self._lock:
+            result = dict(self.counters)
+            result['in_flight'] = self.in_flight
+            result['latency_ms'] = _percentiles(self.latencies)
+            result['render_ms'] = _percentiles(self.render_times)
+        return result
+
+
+def _percentiles(values):
+    if not values:
+        return {}
+    values = sorted(values)
+    last = len(values) - 1
+    return dict((name, round(values[int(last * q)] * 1000, 2))
+                for name, q in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99),
+                                ('max', 1.0)))
+
+
+class RenderHandler(http.server.BaseHTTPRequestHandler):
+
+    server_version = 'ChartRender/1.0'
+
+    def address_string(self):
+        # client_address is an empty string on Unix sockets
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def do_GET(self):
+        if urllib.parse.urlsplit(self.path).path != '/metrics':
+            self._reply(404, b'not found\n')
+            return
+        metrics = self.server.metrics.snapshot()
+        metrics['workers'] = self.server.workers
+        metrics['queue'] = self.server.queue
+        self._reply(200, json.dumps(metrics).encode('utf-8') + b'\n',
+                    'application/json')
+
+    def do_POST(self):
+        url = urllib.parse.urlsplit(self.path)
+        if url.path != '/render':
+            self._reply(404, b'not found\n')
+            return
+
+        metrics = self.server.metrics
+        start = time.perf_counter()
+        metrics.start()
+        if not self.server.slots.acquire(blocking=False):
+            # every worker is busy and the queue is full
+            self._reply(503, b'busy\n', headers={'Retry-After': '1'})
+            metrics.finish('rejected', time.perf_counter() - start)
+            return
+
+        render_time = None
+        submitted = False
+        try:
+            query = urllib.parse.parse_qs(url.query)
+            width = int(query.get('width', [600])[0])
+            height = int(query.get('height', [460])[0])
+            length = int(self.headers.get('Content-Length', 0))
+            data = json.loads(self.rfile.read(length))
+            # the slot is released when the worker is done, even after a
+            # timeout, so slow renders can't pile up in the pool
+            result = self.server.pool.apply_async(
+                render_document, (data, width, height),
+                callback=self.server.release_slot,
+                error_callback=self.server.release_slot)
+            submitted = True
+            image, render_time = result.get(self.server.render_timeout)
+        except multiprocessing.TimeoutError:
+            status, code, body = 'timeout', 504, b'timeout\n'
+        except Exception as error:
+            status, code = 'failed', 400
+            body = ('%s: %s\n' % (type(error).__name__, error)).encode('utf-8')
+        else:
+            status, code = 'rendered', 200
+        finally:
+            if not submitted:
+                self.server.release_slot()
+
+        if code == 200:
+            self._reply(200, image, 'image/png')
+        else:
+            self._reply(code, body)
+        metrics.finish(status, time.perf_counter() - start, render_time)
+
+    def _reply(self, code, body, content_type='text/plain', headers={}):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super(RenderHandler, self).log_message(format, *args)
+
+
+class RenderServer(http.server.ThreadingHTTPServer):
+
+    def __init__(self, address, workers, queue, timeout=30.0, verbose=False):
+        super(RenderServer, self).__init__(address, RenderHandler)
+        self.workers = workers
+        self.queue = queue
+        self.render_timeout = timeout
+        self.verbose = verbose
+        self.metrics = RenderMetrics()
+        # a slot for every request being rendered or waiting for a worker
+        self.slots = threading.BoundedSemaphore(workers + queue)
+        self.pool = multiprocessing.Pool(workers, initializer=_warm_worker)
+
+    def release_slot(self, result=None):
+        '''Free the slot of a request, also called with the result of the
+           render by the pool'''
+        self.slots.release()
+
+    def server_close(self):
+        super(RenderServer, self).server_close()
+        self.pool.terminate()
+        self.pool.join()
+
+
+class UnixRenderServer(socketserver.UnixStreamServer, RenderServer):
+
+    def __init__(self, path, *args, **kwargs):
+        if os.path.exists(path):
+            os.unlink(path)
+        RenderServer.__init__(self, path, *args, **kwargs)
+
+    def server_bind(self):
+        # HTTPServer.server_bind expects a host and port
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name, self.server_port = 'localhost', 0
+
+    def server_close(self):
+        RenderServer.server_close(self)
+        os.unlink(self.server_address)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m renderservice',
+        description='Serve PNG images of Chart documents.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8470)
+    parser.add_argument('--socket', metavar='PATH',
+                        help='listen on a Unix socket instead of TCP')
+    parser.add_argument('-j', '--workers', type=int,
+                        default=os.cpu_count() or 1,
+                        help='number of processes (default: one per CPU)')
+    parser.add_argument('--queue', type=int, default=None,
+                        help='requests that may wait for a worker '
+                             '(default: four per worker)')
+    parser.add_argument('--timeout', type=float, default=30.0,
+                        help='seconds a render may take (default: 30)')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='log every request')
+    args = parser.parse_args(argv)
+
+    queue = args.workers * 4 if args.queue is None else args.queue
+    if args.socket:
+        server = UnixRenderServer(args.socket, args.workers, queue,
+                                  args.timeout, args.verbose)
+    else:
+        server = RenderServer((args.host, args.port), args.workers, queue,
+                              args.timeout, args.verbose)
+
+    print('Serving on %s' % (args.socket or '%s:%d' % server.server_address),
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
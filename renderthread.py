@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import logging
+import queue
+import threading
+
+from gi.repository import GLib
+
+import rendercache
+
+_logger = logging.getLogger('chart-activity')
+
+
+class RenderThread(threading.Thread):
+    '''Renders chart snapshots, one after the other, out of the main loop.
+
+       When a snapshot is drawn the callback given with it is called from
+       the main loop, with GLib.idle_add, as callback(snapshot, error,
+       *args). error is the exception the render raised, or None.
+
+       Only the newest of the queued snapshots is drawn, the older ones
+       are skipped and their callbacks are not called. The PNG images
+       asked with render_png are always made, in order with the renders.
+
+       The thread keeps a sugarpycha chart for every chart type and draws
+       all the snapshots with them, so the geometry and the layers of a
+       render are reused by the next ones.'''
+
+    def __init__(self):
+        threading.Thread.__init__(self, name='chart-render', daemon=True)
+        self._queue = queue.Queue()
+        self._charts = {}
+        self._drop_charts = False
+        self.skipped = 0
+        self.start()
+
+    def render(self, snapshot, callback, *args):
+        '''Queue a snapshot made with chart.Chart.snapshot'''
+        self._queue.put((self._render, (snapshot, ), callback, args))
+
+    def render_png(self, snapshot, cache, callback, *args):
+        '''Queue a snapshot to be encoded as a PNG image, found in or added
+           to cache, a rendercache.RenderCache or None. callback is called
+           as callback(image, error, *args), image is None on errors'''
+        self._queue.put((self._render_png, (snapshot, cache), callback, args))
+
+    def release_memory(self):
+        '''Drop the sugarpycha charts, and their cached layers, before the
+           next render'''
+        self._drop_charts = True
+
+    def run(self):
+        while True:
+            jobs = [self._queue.get()]
+            while not self._queue.empty():
+                jobs.append(self._queue.get())
+
+            renders = [job for job in jobs if job[0] == self._render]
+            for job in jobs:
+                if job[0] == self._render and job is not renders[-1]:
+                    self.skipped += 1
+                    continue
+                self._run_job(*job)
+
+    def _run_job(self, work, work_args, callback, args):
+        if self._drop_charts:
+            self._drop_charts = False
+            self._charts.clear()
+
+        result, error = work(*work_args)
+        GLib.idle_add(self._done, callback, result, error, args)
+
+    def _render(self, snapshot):
+        try:
+            snapshot.render_with(self._charts)
+        except (ZeroDivisionError, ValueError) as e:
+            # the data can't be drawn, like the empty or all zero rows
+            return snapshot, e
+        except Exception as e:
+            _logger.exception('Chart render failed')
+            return snapshot, e
+        return snapshot, None
+
+    def _render_png(self, snapshot, cache):
+        try:
+            image, cached = rendercache.render_png(snapshot, cache)
+        except Exception as e:
+            _logger.exception('Chart image failed')
+            return None, e
+        return image, None
+
+    def _done(self, callback, result, error, args):
+        callback(result, error, *args)
+        return False
+
+
+class RenderScheduler(object):
+    '''Merges the render requests made in the same interval into one.
+
+       request schedules a call to render, with the arguments of the last
+       request, interval milliseconds after the first request not yet
+       served. The requests it supersedes are counted as skipped.'''
+
+    def __init__(self, render, interval=16):
+        self._render = render
+        self.interval = interval
+        self._source = None
+        self._args = ()
+        self.requested = self.rendered = self.skipped = 0
+
+    def request(self, *args):
+        self.requested += 1
+        self._args = args
+        if self._source is not None:
+            self.skipped += 1
+        else:
+            self._source = GLib.timeout_add(self.interval, self._fire)
+
+    def _fire(self):
+        self._source = None
+        self.rendered += 1
+        self._render(*self._args)
+        return False
+
+    def stats(self):
+        '''Return the counters of this scheduler'''
+        return {'requested': self.requested, 'rendered': self.rendered,
+                'skipped': self.skipped}
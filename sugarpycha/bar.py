@@ -15,20 +15,24 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with PyCha.  If not, see <http://www.gnu.org/licenses/>.
 
-from sugarpycha.chart import Chart, uniqueIndices
+import numpy
+
+from sugarpycha.chart import Chart, insideChart, uniqueIndices
 from sugarpycha.color import hex2rgb
+from sugarpycha.geometry import EnvelopeArray, RectArray
+from sugarpycha.sampling import columnStats
 from sugarpycha.utils import safe_unicode
-import collections
 
 
 class BarChart(Chart):
 
     def __init__(self, surface=None, options={}, debug=False):
         super(BarChart, self).__init__(surface, options, debug)
-        self.bars = []
+        self.bars = RectArray()
         self.minxdelta = 0.0
         self.barWidthForSet = 0.0
         self.barMargin = 0.0
+        self.columns = None
 
     def _updateXY(self):
         super(BarChart, self)._updateXY()
@@ -52,7 +56,79 @@ class BarChart(Chart):
         self.barWidthForSet = barWidth / len(stores)
         self.barMargin = k * (1.0 - self.options.barWidthFillFraction) / 2
 
-        self.bars = []
+        self.columns = self._getColumnCount(len(uniqx))
+        self.bars = EnvelopeArray() if self.columns else RectArray()
+
+    def _getColumnCount(self, categories):
+        """Return the number of pixel columns the bars are aggregated into.
+
+        None means one bar per item: either the downsample.mode option is
+        not set or every category gets at least one pixel.
+        """
+        if self.options.downsample.mode is None or self.surface is None:
+            return None
+        columns = int(self._getCategoryExtent())
+        if categories <= columns:
+            return None
+        return columns
+
+    def _getCategoryExtent(self):
+        """Return the surface size along the axis of the categories"""
+        raise NotImplementedError
+
+    def _aggregate(self, dataset):
+        """Aggregates the items of dataset by pixel column.
+
+        Return the (column, xval, mean, low, high) arrays of the non empty
+        columns, where the last three are y values.
+        """
+        position = (dataset.x - self.minxval) * self.xscale + self.barMargin
+        visible = (0.0 <= position) & (position <= 1.0)
+        values = numpy.column_stack((dataset.x[visible], dataset.y[visible]))
+        column, mean, low, high = columnStats(position[visible], values,
+                                              self.columns)
+        return column, mean[:, 0], mean[:, 1], low[:, 1], high[:, 1]
+
+    def _stackEnvelopes(self, aggregates):
+        """Return the value every aggregated mean is stacked on.
+
+        aggregates hold the results of _aggregate for every dataset.
+        """
+        raise NotImplementedError
+
+    def _addEnvelopes(self, dataset, x, y, w, h, xval, yval, bounds):
+        """Appends an Envelope for every aggregated column of dataset.
+
+        bounds are the (x, y, w, h) arrays of the min/max areas. They are
+        clipped to the chart area: stacked on the means of the datasets
+        below, the extremes may reach past the axis range.
+        """
+        x, y, w, h = numpy.broadcast_arrays(x, y, w, h)
+        bx, by, bw, bh = numpy.broadcast_arrays(*bounds)
+        left, top = numpy.clip(bx, 0.0, 1.0), numpy.clip(by, 0.0, 1.0)
+        bw = numpy.clip(bx + bw, 0.0, 1.0) - left
+        bh = numpy.clip(by + bh, 0.0, 1.0) - top
+        bx, by = left, top
+        visible = insideChart(x, y)
+        self.bars.extend(EnvelopeArray(
+            dataset.name, x=x[visible], y=y[visible], w=w[visible],
+            h=h[visible], xval=xval[visible], yval=yval[visible],
+            bx=bx[visible], by=by[visible], bw=bw[visible], bh=bh[visible]))
+
+    def _makeBars(self, dataset, x, y, w, h, yerr=None):
+        """Return a RectArray with the bars of dataset inside the chart area.
+
+        x, y, w and h are arrays (or scalars) in chart coordinates. yerr
+        defaults to the errors of the dataset.
+        """
+        if yerr is None:
+            yerr = dataset.getYErr()
+        x, y, w, h, yerr = numpy.broadcast_arrays(x, y, w, h, yerr)
+        visible = insideChart(x, y)
+        return RectArray(
+            dataset.name, x=x[visible], y=y[visible], w=w[visible],
+            h=h[visible], xval=dataset.x[visible], yval=dataset.y[visible],
+            yerr=yerr[visible])
 
     def _renderChart(self, cx):
         """Renders a horizontal/vertical bar chart"""
@@ -100,7 +176,7 @@ class BarChart(Chart):
                 cx.set_font_size(self.options.yvals.fontSize)
                 cx.set_source_rgb(*hex2rgb(self.options.yvals.fontColor))
 
-                if isinstance(self.options.yvals.renderer, collections.Callable):
+                if callable(self.options.yvals.renderer):
                     label = safe_unicode(self.options.yvals.renderer(bar),
                                          self.options.encoding)
                 else:
@@ -113,39 +189,95 @@ class BarChart(Chart):
 
                 cx.restore()
 
+        def drawEnvelope(bar):
+            r, g, b = self.colorScheme[bar.name]
+            bx, by, bw, bh = bar.bounds
+            cx.set_source_rgba(r, g, b, 0.4)
+            cx.rectangle(self.layout.chart.x + self.layout.chart.w * bx,
+                         self.layout.chart.y + self.layout.chart.h * by,
+                         self.layout.chart.w * bw,
+                         self.layout.chart.h * bh)
+            cx.fill()
+
+            cx.set_source_rgb(r, g, b)
+            cx.rectangle(self.layout.chart.x + self.layout.chart.w * bar.x,
+                         self.layout.chart.y + self.layout.chart.h * bar.y,
+                         self.layout.chart.w * bar.w,
+                         self.layout.chart.h * bar.h)
+            cx.fill()
+
         cx.save()
-        for bar in self.bars:
-            drawBar(bar)
+        if self.columns:
+            for bar in self.bars:
+                drawEnvelope(bar)
+        else:
+            for bar in self.bars:
+                drawBar(bar)
         cx.restore()
 
     def _renderYVal(self, cx, label, width, height, x, y, w, h):
         raise NotImplementedError
 
+    def _getItemBoxes(self, tolerance):
+        chart = self.layout.chart
+        bars = self.bars
+        x0, y0, x1, y1 = bars.x, bars.y, bars.x + bars.w, bars.y + bars.h
+        if self.columns:
+            # the min/max area of an envelope can be hovered as well
+            x0 = numpy.minimum(x0, bars.bx)
+            y0 = numpy.minimum(y0, bars.by)
+            x1 = numpy.maximum(x1, bars.bx + bars.bw)
+            y1 = numpy.maximum(y1, bars.by + bars.bh)
+        return self.bars, (x0 * chart.w + chart.x, y0 * chart.h + chart.y,
+                           x1 * chart.w + chart.x, y1 * chart.h + chart.y)
+
 
 class VerticalBarChart(BarChart):
 
     def _updateChart(self):
         """Evaluates measures for vertical bars"""
         super(VerticalBarChart, self)._updateChart()
-        for i, (name, store) in enumerate(self.datasets):
-            for item in store:
-                if len(item) == 3:
-                    xval, yval, yerr = item
-                else:
-                    xval, yval = item
-
-                x = (((xval - self.minxval) * self.xscale)
-                     + self.barMargin + (i * self.barWidthForSet))
-                w = self.barWidthForSet
-                h = abs(yval) * self.yscale
-                if yval > 0:
-                    y = (1.0 - h) - self.origin
-                else:
-                    y = 1 - self.origin
-                rect = Rect(x, y, w, h, xval, yval, name)
-
-                if (0.0 <= rect.x <= 1.0) and (0.0 <= rect.y <= 1.0):
-                    self.bars.append(rect)
+        if self.columns:
+            self._updateEnvelopes()
+            return
+
+        bars = []
+        for i, dataset in enumerate(self.datasets):
+            x = (((dataset.x - self.minxval) * self.xscale)
+                 + self.barMargin + (i * self.barWidthForSet))
+            h = numpy.abs(dataset.y) * self.yscale
+            y = numpy.where(dataset.y > 0,
+                            (1.0 - h) - self.origin,
+                            1 - self.origin)
+            # vertical bars have never drawn the error values
+            bars.append(self._makeBars(dataset, x, y, self.barWidthForSet, h,
+                                       yerr=0.0))
+        self.bars = RectArray.concatenate(bars)
+
+    def _updateEnvelopes(self, stacked=False):
+        """Evaluates one envelope per pixel column and dataset"""
+        step = 1.0 / self.columns
+        width = step if stacked else step / len(self.datasets)
+        aggregates = [self._aggregate(dataset) for dataset in self.datasets]
+        if stacked:
+            bases = self._stackEnvelopes(aggregates)
+        else:
+            bases = [0.0] * len(aggregates)
+        for i, (dataset, aggregate, base) in enumerate(
+                zip(self.datasets, aggregates, bases)):
+            column, xval, mean, low, high = aggregate
+            x = column * step
+            if not stacked:
+                x += i * width
+            h = numpy.abs(mean) * self.yscale
+            top = numpy.maximum(base, base + mean)
+            y = (1.0 - self.origin) - top * self.yscale
+            top = (1.0 - self.origin) - (base + high) * self.yscale
+            bounds = (x, top, width, (high - low) * self.yscale)
+            self._addEnvelopes(dataset, x, y, width, h, xval, mean, bounds)
+
+    def _getCategoryExtent(self):
+        return self.getSurfaceSize()[0]
 
     def _updateTicks(self):
         """Evaluates bar ticks"""
@@ -198,27 +330,42 @@ class HorizontalBarChart(BarChart):
     def _updateChart(self):
         """Evaluates measures for horizontal bars"""
         super(HorizontalBarChart, self)._updateChart()
-
-        for i, (name, store) in enumerate(self.datasets):
-            for item in store:
-                if len(item) == 3:
-                    xval, yval, yerr = item
-                else:
-                    xval, yval = item
-                    yerr = 0.0
-
-                y = (((xval - self.minxval) * self.xscale)
-                     + self.barMargin + (i * self.barWidthForSet))
-                h = self.barWidthForSet
-                w = abs(yval) * self.yscale
-                if yval > 0:
-                    x = self.origin
-                else:
-                    x = self.origin - w
-                rect = Rect(x, y, w, h, xval, yval, name, yerr)
-
-                if (0.0 <= rect.x <= 1.0) and (0.0 <= rect.y <= 1.0):
-                    self.bars.append(rect)
+        if self.columns:
+            self._updateEnvelopes()
+            return
+
+        bars = []
+        for i, dataset in enumerate(self.datasets):
+            y = (((dataset.x - self.minxval) * self.xscale)
+                 + self.barMargin + (i * self.barWidthForSet))
+            w = numpy.abs(dataset.y) * self.yscale
+            x = numpy.where(dataset.y > 0, self.origin, self.origin - w)
+            bars.append(self._makeBars(dataset, x, y, w, self.barWidthForSet))
+        self.bars = RectArray.concatenate(bars)
+
+    def _updateEnvelopes(self, stacked=False):
+        """Evaluates one envelope per pixel row and dataset"""
+        step = 1.0 / self.columns
+        height = step if stacked else step / len(self.datasets)
+        aggregates = [self._aggregate(dataset) for dataset in self.datasets]
+        if stacked:
+            bases = self._stackEnvelopes(aggregates)
+        else:
+            bases = [0.0] * len(aggregates)
+        for i, (dataset, aggregate, base) in enumerate(
+                zip(self.datasets, aggregates, bases)):
+            column, xval, mean, low, high = aggregate
+            y = column * step
+            if not stacked:
+                y += i * height
+            w = numpy.abs(mean) * self.yscale
+            x = self.origin + numpy.minimum(base, base + mean) * self.yscale
+            left = self.origin + (base + low) * self.yscale
+            bounds = (left, y, (high - low) * self.yscale, height)
+            self._addEnvelopes(dataset, x, y, w, height, xval, mean, bounds)
+
+    def _getCategoryExtent(self):
+        return self.getSurfaceSize()[1]
 
     def _updateTicks(self):
         """Evaluates bar ticks"""
@@ -303,17 +450,3 @@ class HorizontalBarChart(BarChart):
         cx.move_to(right, top)
         cx.line_to(right, bottom)
         cx.stroke()
-
-
-class Rect(object):
-
-    def __init__(self, x, y, w, h, xval, yval, name, yerr=0.0):
-        self.x, self.y, self.w, self.h = x, y, w, h
-        self.xval, self.yval, self.yerr = xval, yval, yerr
-        self.name = name
-
-    def __str__(self):
-        return ("<pycha.bar.Rect@(%.2f, %.2f) %.2fx%.2f (%.2f, %.2f, %.2f) %s>"
-                % (self.x, self.y, self.w, self.h,
-                   self.xval, self.yval, self.yerr,
-                   self.name))
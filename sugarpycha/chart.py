@@ -15,20 +15,23 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with PyCha.  If not, see <http://www.gnu.org/licenses/>.
 
-import copy
+import collections
 import inspect
 import math
+import threading
 
 import cairo
 
 from sugarpycha.color import ColorScheme, hex2rgb, DEFAULT_COLOR
+from sugarpycha.dataset import Dataset, toDataset
+from sugarpycha.spatial import ItemLocator
 from sugarpycha.utils import safe_unicode
-import collections
-from functools import reduce
 
 
 class Chart(object):
 
+    itemTolerance = 4.0  # pixels around the items getItemAt hits
+
     def __init__(self, surface, options={}, debug=False):
         # this flag is useful to reuse this chart for drawing different data
         # or use different options
@@ -53,9 +56,7 @@ class Chart(object):
         self.yticks = []
 
         # set the default options
-        self.options = copy.deepcopy(DEFAULT_OPTIONS)
-        if options:
-            self.options.merge(options)
+        self.options = FROZEN_DEFAULT_OPTIONS.overlay(options)
 
         # initialize the surface
         self._initSurface(surface)
@@ -65,23 +66,42 @@ class Chart(object):
         # debug mode to draw aditional hints
         self.debug = debug
 
+        # when enabled the background, data, axis and legend are drawn in
+        # separate surfaces that are only redrawn when their inputs change
+        self.cacheLayers = False
+        self._layers = {}
+
+        # lookup of the rendered items, built on the first lookup
+        self._itemLocator = None
+
+        # (width, height) of the whole chart while it is drawn in tiles
+        self.fullSize = None
+
     def addDataset(self, dataset):
-        """Adds an object containing chart data to the storage hash"""
-        self.datasets += dataset
+        """Adds an object containing chart data to the storage hash
+
+        dataset is a Dataset or a sequence of Dataset objects and/or
+        (name, [(x, y), ...]) pairs.
+        """
+        if isinstance(dataset, Dataset):
+            dataset = [dataset]
+        self.datasets += [toDataset(d) for d in dataset]
 
     def _getDatasetsKeys(self):
         """Return the name of each data set"""
-        return [d[0] for d in self.datasets]
+        return [d.name for d in self.datasets]
 
     def _getDatasetsValues(self):
         """Return the data (value) of each data set"""
-        return [d[1] for d in self.datasets]
+        return list(self.datasets)
 
     def setOptions(self, options={}):
         """Sets options of this chart"""
-        self.options.merge(options)
+        self.options = self.options.overlay(options)
 
     def getSurfaceSize(self):
+        if self.fullSize is not None:
+            return self.fullSize
         cx = cairo.Context(self.surface)
         x, y, w, h = cx.clip_extents()
         return w, h
@@ -92,7 +112,7 @@ class Chart(object):
         In the next render the surface will be cleaned before any drawing.
         """
         self.resetFlag = True
-        self.options = copy.deepcopy(DEFAULT_OPTIONS)
+        self.options = FROZEN_DEFAULT_OPTIONS
         self.datasets = []
 
     def render(self, surface=None, options={}):
@@ -101,16 +121,39 @@ class Chart(object):
         The optional parameters can be used to render a chart in a different
         surface with new options.
         """
-        self._update(options)
         if surface:
             self._initSurface(surface)
+        self.fullSize = None
+        self._update(options)
+        self._draw(cairo.Context(self.surface))
+
+    def renderTile(self, surface, x, y, width, height, options={}):
+        """Renders the tile at (x, y) of a width x height chart.
+
+        surface only holds the tile. The chart is updated for the first
+        tile and when the options or the chart size change, so the data
+        must stay the same while the tiles of an image are drawn. Layers
+        are not cached for tiles.
+        """
+        self._initSurface(surface)
+        if options or self.fullSize != (width, height):
+            self.fullSize = (width, height)
+            self._update(options)
 
         cx = cairo.Context(self.surface)
+        cx.translate(-x, -y)
+        self._draw(cx)
 
+    def _draw(self, cx):
         # calculate area data
         surface_width, surface_height = self.getSurfaceSize()
         self.layout.update(cx, self.options, surface_width, surface_height,
                            self.xticks, self.yticks)
+        self._itemLocator = None
+
+        if self.cacheLayers and self.fullSize is None:
+            self._renderLayers(cx, surface_width, surface_height)
+            return
 
         self._renderBackground(cx)
         if self.debug:
@@ -120,6 +163,86 @@ class Chart(object):
         self._renderTitle(cx)
         self._renderLegend(cx)
 
+    def _renderLayers(self, cx, width, height):
+        """Composites the cached layers into cx, redrawing the stale ones"""
+        layers = (
+            ('background', self._getBackgroundFingerprint(),
+             (self._renderBackground, self._renderDebugLayout)),
+            ('chart', self._getChartFingerprint(), (self._renderChart, )),
+            ('axis', self._getAxisFingerprint(),
+             (self._renderAxis, self._renderTitle)),
+            ('legend', self._getLegendFingerprint(), (self._renderLegend, )),
+        )
+        size = (int(math.ceil(width)), int(math.ceil(height)))
+        geometry = self.layout.getGeometry()
+
+        for name, fingerprint, painters in layers:
+            fingerprint = (size, geometry, fingerprint)
+            layer = self._layers.get(name)
+            if layer is None or layer[0] != fingerprint:
+                if layer is not None and layer[0][0] == size:
+                    surface = layer[1]
+                else:
+                    surface = self.surface.create_similar(
+                        cairo.CONTENT_COLOR_ALPHA, *size)
+                layer_cx = cairo.Context(surface)
+                layer_cx.set_operator(cairo.OPERATOR_CLEAR)
+                layer_cx.paint()
+                layer_cx.set_operator(cairo.OPERATOR_OVER)
+                for paint in painters:
+                    paint(layer_cx)
+                layer = self._layers[name] = (fingerprint, surface)
+
+            cx.set_source_surface(layer[1], 0, 0)
+            cx.paint()
+
+    def invalidateLayers(self):
+        """Drops the cached layers so the next render draws everything"""
+        self._layers = {}
+
+    def _renderDebugLayout(self, cx):
+        if self.debug:
+            self.layout.render(cx)
+
+    def _getBackgroundFingerprint(self):
+        """Return the inputs of the background and grid lines layer"""
+        return (self.options.background, self.options.padding,
+                self.options.axis.lineWidth,
+                self.options.axis.x.showLines, self.options.axis.y.showLines,
+                tuple(self.xticks), tuple(self.yticks), self.debug)
+
+    def _getChartFingerprint(self):
+        """Return the inputs of the data layer"""
+        return (tuple([d.getFingerprint() for d in self.datasets]),
+                self.minxval, self.maxxval, self.minyval, self.maxyval,
+                self.xscale, self.yscale, self.origin,
+                sorted(self.colorScheme.items()),
+                self.options.stroke, self.options.yvals,
+                self.options.shouldFill, self.options.fillOpacity,
+                self.options.barWidthFillFraction, self.options.pieRadius,
+                self.options.downsample, self.options.encoding, self.debug)
+
+    def _getAxisFingerprint(self):
+        """Return the inputs of the axis and title layer"""
+        return (self.options.axis, self.options.title,
+                self.options.titleColor, self.options.titleFont,
+                self.options.titleFontSize, self.options.encoding,
+                tuple(self.xticks), tuple(self.yticks), self.origin,
+                self.debug)
+
+    def _getLegendFingerprint(self):
+        """Return the inputs of the legend layer"""
+        return (self.options.legend, self.options.encoding,
+                [(key, self.colorScheme[key])
+                 for key in self._getDatasetsKeys()])
+
+    def clearDatasets(self):
+        """Removes the datasets but keeps the options and computed layout.
+
+        Use it to draw new data with the same chart object.
+        """
+        self.datasets = []
+
     def clean(self):
         """Clears the surface with a white background."""
         cx = cairo.Context(self.surface)
@@ -140,7 +263,7 @@ class Chart(object):
 
         # Remove invalid args before calling the constructor
         kwargs = dict(self.options.colorScheme.args)
-        validArgs = inspect.getargspec(colorSchemeClass.__init__)[0]
+        validArgs = inspect.getfullargspec(colorSchemeClass.__init__)[0]
         kwargs = dict([(k, v)
                       for k, v in list(kwargs.items()) if k in validArgs])
         self.colorScheme = colorSchemeClass(keys, **kwargs)
@@ -166,15 +289,17 @@ class Chart(object):
         y_range_is_defined = self.options.axis.y.range is not None
 
         if not x_range_is_defined or not y_range_is_defined:
-            stores = self._getDatasetsValues()
+            stores = [d for d in self._getDatasetsValues() if len(d)]
+            if not stores:
+                raise ValueError('There is no data to compute the ranges')
 
         # gather data for the x axis
         if x_range_is_defined:
             self.minxval, self.maxxval = self.options.axis.x.range
         else:
-            xdata = [pair[0] for pair in reduce(lambda a, b: a + b, stores)]
-            self.minxval = float(min(xdata))
-            self.maxxval = float(max(xdata))
+            xranges = [store.xRange() for store in stores]
+            self.minxval = min([r[0] for r in xranges])
+            self.maxxval = max([r[1] for r in xranges])
             if self.minxval * self.maxxval > 0 and self.minxval > 0:
                 self.minxval = 0.0
 
@@ -188,9 +313,9 @@ class Chart(object):
         if y_range_is_defined:
             self.minyval, self.maxyval = self.options.axis.y.range
         else:
-            ydata = [pair[1] for pair in reduce(lambda a, b: a + b, stores)]
-            self.minyval = float(min(ydata))
-            self.maxyval = float(max(ydata))
+            yranges = [store.yRange() for store in stores]
+            self.minyval = min([r[0] for r in yranges])
+            self.maxyval = max([r[1] for r in yranges])
             if self.minyval * self.maxyval > 0 and self.minyval > 0:
                 self.minyval = 0.0
 
@@ -215,8 +340,6 @@ class Chart(object):
         values of xscale, minxval, yscale, and other attributes needed for
         this method.
         """
-        stores = self._getDatasetsValues()
-
         # evaluate xTicks
         self.xticks = []
         if self.options.axis.x.ticks:
@@ -245,16 +368,11 @@ class Chart(object):
                 pos = self.xscale * (label - self.minxval)
 
         elif self.options.axis.x.tickCount > 0:
-            uniqx = list(range(len(uniqueIndices(stores)) + 1))
-            roughSeparation = self.xrange / self.options.axis.x.tickCount
-            i = j = 0
-            while i < len(uniqx) and j < self.options.axis.x.tickCount:
-                if (uniqx[i] - self.minxval) >= (j * roughSeparation):
-                    pos = self.xscale * (uniqx[i] - self.minxval)
-                    if 0.0 <= pos <= 1.0:
-                        self.xticks.append((pos, uniqx[i]))
-                        j += 1
-                i += 1
+            # x values are usually category indexes, so the steps are whole
+            for xval in niceTicks(self.minxval, self.maxxval,
+                                  self.options.axis.x.tickCount, 1):
+                pos = min(max(self.xscale * (xval - self.minxval), 0.0), 1.0)
+                self.xticks.append((pos, int(round(xval))))
 
         # evaluate yTicks
         self.yticks = []
@@ -284,21 +402,17 @@ class Chart(object):
                 pos = 1.0 - (self.yscale * (label - self.minyval))
 
         elif self.options.axis.y.tickCount > 0:
+            # labels are rounded to prec digits, so steps can't be smaller
             prec = self.options.axis.y.tickPrecision
-            num = self.yrange / self.options.axis.y.tickCount
-            if (num < 1 and prec == 0):
-                roughSeparation = 1
-            else:
-                roughSeparation = round(num, prec)
-
-            for i in range(self.options.axis.y.tickCount + 1):
-                yval = self.minyval + (i * roughSeparation)
+            for yval in niceTicks(self.minyval, self.maxyval,
+                                  self.options.axis.y.tickCount,
+                                  10.0 ** -prec):
                 pos = 1.0 - ((yval - self.minyval) * self.yscale)
-                if 0.0 <= pos <= 1.0:
-                    pretty_label = round(yval, prec)
-                    if prec == 0:
-                        pretty_label = int(pretty_label)
-                    self.yticks.append((pos, pretty_label))
+                pos = min(max(pos, 0.0), 1.0)
+                pretty_label = round(yval, prec)
+                if prec == 0:
+                    pretty_label = int(pretty_label)
+                self.yticks.append((pos, pretty_label))
 
     def _renderBackground(self, cx):
         """Renders the background area of the chart"""
@@ -358,9 +472,43 @@ class Chart(object):
     def _renderChart(self, cx):
         raise NotImplementedError
 
+    def getItemAt(self, x, y, tolerance=None):
+        """Return the item drawn at the device coordinate (x, y).
+
+        The item is a Point, Rect or Slice depending on the chart type, or
+        None if there is nothing there. Points are hit within tolerance
+        pixels, itemTolerance by default.
+        """
+        return self.getItemLocator(tolerance).getItemAt(x, y)
+
+    def getItemLocator(self, tolerance=None):
+        """Return the ItemLocator of the items of the last render.
+
+        The first call after a render builds it, later ones return the same
+        object. Call it right after rendering to have the lookups of another
+        thread never wait for the index.
+        """
+        if tolerance is None:
+            tolerance = self.itemTolerance
+        locator = self._itemLocator
+        if locator is None or locator.tolerance != tolerance:
+            locator = self._itemLocator = self._makeItemLocator(tolerance)
+        return locator
+
+    def _makeItemLocator(self, tolerance):
+        items, boxes = self._getItemBoxes(tolerance)
+        return ItemLocator(items, boxes, tolerance)
+
+    def _getItemBoxes(self, tolerance):
+        """Return the items that getItemAt can find and their device boxes.
+
+        The boxes are a tuple of (x0, y0, x1, y1) arrays.
+        """
+        return [], ((), (), (), ())
+
     def _renderTick(self, cx, tick, x, y, x2, y2, rotate, text_position):
         """Aux method for _renderXTick and _renderYTick"""
-        if isinstance(tick, collections.Callable):
+        if callable(tick):
             return
 
         cx.new_path()
@@ -375,7 +523,9 @@ class Chart(object):
         cx.set_font_size(self.options.axis.tickFontSize)
 
         label = safe_unicode(tick[1], self.options.encoding)
-        xb, yb, width, height, xa, ya = cx.text_extents(label)
+        xb, yb, width, height, xa, ya = textExtentsCache.get(
+            cx, label, self.options.axis.tickFont,
+            self.options.axis.tickFontSize)
 
         x, y = text_position
 
@@ -441,7 +591,9 @@ class Chart(object):
         cx.set_font_size(self.options.axis.labelFontSize)
         cx.set_source_rgb(*hex2rgb(self.options.axis.labelColor))
 
-        xb, yb, width, height, xa, ya = cx.text_extents(label)
+        xb, yb, width, height, xa, ya = textExtentsCache.get(
+            cx, label, self.options.axis.labelFont,
+            self.options.axis.labelFontSize, weight=cairo.FONT_WEIGHT_BOLD)
 
         if vertical:
             y = y + width / 2.0
@@ -534,7 +686,9 @@ class Chart(object):
             cx.set_source_rgb(*hex2rgb(self.options.titleColor))
 
             title = safe_unicode(self.options.title, self.options.encoding)
-            extents = cx.text_extents(title)
+            extents = textExtentsCache.get(cx, title, self.options.titleFont,
+                                           self.options.titleFontSize,
+                                           weight=cairo.FONT_WEIGHT_BOLD)
             title_width = extents[2]
 
             x = (self.layout.title.x
@@ -559,34 +713,32 @@ class Chart(object):
         bullet = 15
         width = 0
         height = padding
-        keys = self._getDatasetsKeys()
+        keys = [safe_unicode(key, self.options.encoding)
+                for key in self._getDatasetsKeys()]
         cx.select_font_face(self.options.legend.legendFont,
                             cairo.FONT_SLANT_NORMAL,
                             cairo.FONT_WEIGHT_NORMAL)
         cx.set_font_size(self.options.legend.legendFontSize)
-        for key in keys:
-            key = safe_unicode(key, self.options.encoding)
-            extents = cx.text_extents(key)
+        keyExtents = [textExtentsCache.get(cx, key,
+                                           self.options.legend.legendFont,
+                                           self.options.legend.legendFontSize)
+                      for key in keys]
+        for extents in keyExtents:
             width = max(extents[2], width)
             height += max(extents[3], bullet) + padding
         width = padding + bullet + padding + width + padding
 
         # Compute legend position
-        legend = self.options.legend
-        if legend.position.right is not None:
-            legend.position.left = (surface_width
-                                    - legend.position.right
-                                    - width)
-        if legend.position.bottom is not None:
-            legend.position.top = (surface_height
-                                   - legend.position.bottom
-                                   - height)
+        position = self.options.legend.position
+        left, top = position.left, position.top
+        if position.right is not None:
+            left = surface_width - position.right - width
+        if position.bottom is not None:
+            top = surface_height - position.bottom - height
 
         # Draw the legend
         cx.save()
-        cx.rectangle(self.options.legend.position.left,
-                     self.options.legend.position.top,
-                     width, height)
+        cx.rectangle(left, top, width, height)
         cx.set_source_rgba(1, 1, 1, self.options.legend.opacity)
         cx.fill_preserve()
         cx.set_line_width(self.options.legend.borderWidth)
@@ -604,21 +756,65 @@ class Chart(object):
             cx.show_text(key)
 
         cx.set_line_width(1)
-        x = self.options.legend.position.left + padding
-        y = self.options.legend.position.top + padding
-        for key in keys:
-            extents = cx.text_extents(key)
+        x = left + padding
+        y = top + padding
+        for key, extents in zip(keys, keyExtents):
             drawKey(key, x, y, extents[3])
             y += max(extents[3], bullet) + padding
 
         cx.restore()
 
 
+def niceNumber(value, rounded=True):
+    """Return a number close to value that is 1, 2 or 5 times a power of 10.
+
+    If rounded is False the result is not smaller than value. This is
+    Heckbert's algorithm from "Nice Numbers for Graph Labels".
+    """
+    exponent = math.floor(math.log10(value))
+    fraction = value / 10.0 ** exponent
+    if rounded:
+        nice = [n for n, limit in ((1, 1.5), (2, 3), (5, 7), (10, None))
+                if limit is None or fraction < limit][0]
+    else:
+        nice = [n for n in (1, 2, 5, 10) if fraction <= n][0]
+    return nice * 10.0 ** exponent
+
+
+def niceTicks(low, high, count, minStep=0.0):
+    """Return about count nice values between low and high.
+
+    The values are the multiples of a niceNumber step inside the range,
+    so the cost only depends on count. The step is never smaller than
+    minStep, which should be a nice number too.
+    """
+    span = high - low
+    if span <= 0 or count < 1:
+        return [low]
+
+    step = max(niceNumber(span / count), minStep)
+    # tolerate rounding errors at both ends of the range
+    first = int(math.ceil(low / step - 1e-9))
+    last = int(math.floor(high / step + 1e-9))
+    digits = max(0, -int(math.floor(math.log10(step))))
+    return [round(k * step, digits) for k in range(first, last + 1)]
+
+
 def uniqueIndices(arr):
     """Return a list with the indexes of the biggest element of arr"""
     return list(range(max([len(a) for a in arr])))
 
 
+def insideChart(x, y, tolerance=1e-9):
+    """Return the mask of the (x, y) arrays inside the [0, 1] chart area.
+
+    The coordinates computed for the edges of the area may be off by a
+    rounding error, the tolerance keeps them inside.
+    """
+    low, high = -tolerance, 1.0 + tolerance
+    return (low <= x) & (x <= high) & (low <= y) & (y <= high)
+
+
 class Area(object):
 
     """Simple rectangle to hold an area coordinates and dimensions"""
@@ -631,15 +827,63 @@ class Area(object):
         return msg % (self.x, self.y, self.w, self.h)
 
 
+class TextExtentsCache(object):
+
+    """Bounded LRU cache of text extents shared by all the charts.
+
+    Entries are keyed by (font family, slant, weight, size, text) and hold
+    the tuple returned by cairo's text_extents.
+    """
+
+    def __init__(self, maxSize=4096):
+        self.maxSize = maxSize
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cx, text, font, size,
+            slant=cairo.FONT_SLANT_NORMAL, weight=cairo.FONT_WEIGHT_NORMAL):
+        """Return the extents of text, measuring it with cx on a miss"""
+        key = (font, slant, weight, size, text)
+        with self._lock:
+            extents = self._entries.get(key)
+            if extents is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return extents
+            self.misses += 1
+
+        cx.save()
+        cx.select_font_face(font, slant, weight)
+        cx.set_font_size(size)
+        extents = tuple(cx.text_extents(text))
+        cx.restore()
+
+        with self._lock:
+            self._entries[key] = extents
+            while len(self._entries) > self.maxSize:
+                self._entries.popitem(last=False)
+        return extents
+
+    def clear(self):
+        """Forget all the entries and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+textExtentsCache = TextExtentsCache()
+
+
 def get_text_extents(cx, text, font, font_size, encoding):
     if text:
-        cx.save()
-        cx.select_font_face(font,
-                            cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_BOLD)
-        cx.set_font_size(font_size)
         safe_text = safe_unicode(text, encoding)
-        extents = cx.text_extents(safe_text)
-        cx.restore()
+        extents = textExtentsCache.get(cx, safe_text, font, font_size,
+                                       weight=cairo.FONT_WEIGHT_BOLD)
         return extents[2:4]
     return (0.0, 0.0)
 
@@ -669,7 +913,43 @@ class Layout(object):
             (self.chart, (75 / 255.0, 75 / 255.0, 1.0)),  # blue
         )
 
+        # inputs of the last computed geometry
+        self._fingerprint = None
+
     def update(self, cx, options, width, height, xticks, yticks):
+        """Computes the areas, reusing the previous ones if no relevant
+        input changed since the last call"""
+        fingerprint = self._getFingerprint(options, width, height,
+                                           xticks, yticks)
+        if fingerprint == self._fingerprint:
+            return
+        self._compute(cx, options, width, height, xticks, yticks)
+        self._fingerprint = fingerprint
+
+    def invalidate(self):
+        """Forces the next update to compute the areas again"""
+        self._fingerprint = None
+
+    def getGeometry(self):
+        """Return the position and size of every area as a tuple"""
+        return tuple([(area.x, area.y, area.w, area.h)
+                      for area, color in self._areas])
+
+    def _getFingerprint(self, options, width, height, xticks, yticks):
+        """Return the inputs the geometry depends on"""
+        axis = options.axis
+        return (width, height,
+                tuple(options.padding.items()),
+                options.title, options.titleFont, options.titleFontSize,
+                options.encoding,
+                axis.labelFont, axis.labelFontSize,
+                axis.tickFont, axis.tickFontSize, axis.tickSize,
+                axis.x.label, axis.x.hide, axis.x.rotate,
+                axis.y.label, axis.y.hide, axis.y.rotate,
+                tuple([tick[1] for tick in xticks]),
+                tuple([tick[1] for tick in yticks]))
+
+    def _compute(self, cx, options, width, height, xticks, yticks):
         self.title.x = options.padding.left
         self.title.y = options.padding.top
         self.title.w = width - (options.padding.left + options.padding.right)
@@ -756,17 +1036,12 @@ class Layout(object):
         cx.restore()
 
     def _getAxisTickLabelsSize(self, cx, options, axis, ticks):
-        cx.save()
-        cx.select_font_face(options.axis.tickFont,
-                            cairo.FONT_SLANT_NORMAL,
-                            cairo.FONT_WEIGHT_NORMAL)
-        cx.set_font_size(options.axis.tickFontSize)
-
         max_width = max_height = 0.0
         if not axis.hide:
-            extents = [cx.text_extents(safe_unicode(
-                tick[1], options.encoding,
-            ))[2:4]  # get width and height as a tuple
+            extents = [textExtentsCache.get(
+                cx, safe_unicode(tick[1], options.encoding),
+                options.axis.tickFont, options.axis.tickFontSize,
+            )[2:4]  # get width and height as a tuple
                 for tick in ticks]
             if extents:
                 widths, heights = list(zip(*extents))
@@ -779,7 +1054,6 @@ class Layout(object):
                         max_width * cos + max_height * sin,
                         max_width * sin + max_height * cos,
                     )
-        cx.restore()
         return max_width, max_height
 
 
@@ -788,9 +1062,9 @@ class Option(dict):
     """Useful dict that allow attribute-like access to its keys"""
 
     def __getattr__(self, name):
-        if name in list(self.keys()):
+        try:
             return self[name]
-        else:
+        except KeyError:
             raise AttributeError(name)
 
     def merge(self, other):
@@ -798,9 +1072,132 @@ class Option(dict):
         for key, value in list(other.items()):
             if key in self:
                 if isinstance(self[key], Option):
-                    self[key].merge(other[key])
+                    if not isinstance(value, dict):
+                        raise ValueError('Option "%s" must be a dict, not %r'
+                                         % (key, value))
+                    self[key].merge(value)
                 else:
-                    self[key] = other[key]
+                    self[key] = value
+
+    def freeze(self):
+        """Return a read-only copy of this option tree.
+
+        Every nested Option is compiled into a FrozenOption so the values
+        can be read as plain slot attributes.
+        """
+        fields = tuple(self.keys())
+        for key in fields:
+            if not key.isidentifier() or hasattr(FrozenOption, key):
+                raise ValueError('Invalid option name "%s"' % key)
+
+        frozen = object.__new__(_getFrozenOptionClass(fields))
+        for key, value in self.items():
+            if isinstance(value, Option):
+                value = value.freeze()
+            object.__setattr__(frozen, key, value)
+        return frozen
+
+
+class FrozenOption(object):
+
+    """Read-only option tree where each key is stored in a slot.
+
+    Instances are created with Option.freeze. They support attribute access
+    and the read-only part of the dict interface.
+    """
+
+    __slots__ = ()
+    _fields = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Option "%s" is read-only' % name)
+
+    def __delattr__(self, name):
+        raise AttributeError('Option "%s" is read-only' % name)
+
+    def overlay(self, overrides):
+        """Return this tree with the values of overrides on top of it.
+
+        overrides is a dict, Option or FrozenOption tree; keys that are not
+        options are ignored. Only the nodes on the path to an overridden
+        value are copied, the rest of the tree is shared with this one, so
+        the cost depends on the size of overrides and not on the number of
+        options.
+        """
+        values = None
+        for key, value in overrides.items():
+            if key not in self._fields:
+                continue
+
+            current = getattr(self, key)
+            if isinstance(current, FrozenOption):
+                if not isinstance(value, (dict, FrozenOption)):
+                    raise ValueError('Option "%s" must be a dict, not %r'
+                                     % (key, value))
+                value = current.overlay(value)
+
+            if value is not current:
+                if values is None:
+                    values = dict(self.items())
+                values[key] = value
+
+        if values is None:
+            return self
+
+        frozen = object.__new__(type(self))
+        for key, value in values.items():
+            object.__setattr__(frozen, key, value)
+        return frozen
+
+    def __getitem__(self, key):
+        if key not in self._fields:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self._fields
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def keys(self):
+        return self._fields
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in self._fields]
+
+    def __eq__(self, other):
+        if not isinstance(other, FrozenOption):
+            return NotImplemented
+        return self.items() == other.items()
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'FrozenOption(%s)' % ', '.join(['%s=%r' % item
+                                              for item in self.items()])
+
+
+_frozenOptionClasses = {}
+
+
+def _getFrozenOptionClass(fields):
+    """Return the FrozenOption subclass with one slot per field"""
+    klass = _frozenOptionClasses.get(fields)
+    if klass is None:
+        klass = type('FrozenOption', (FrozenOption, ),
+                     {'__slots__': fields, '_fields': fields})
+        _frozenOptionClasses[fields] = klass
+    return klass
 
 
 DEFAULT_OPTIONS = Option(
@@ -873,6 +1270,11 @@ DEFAULT_OPTIONS = Option(
         snapToOrigin=False,
         renderer=None
     ),
+    downsample=Option(
+        mode=None,
+        pointsPerPixel=2.0,
+        tolerance=0.5,
+    ),
     fillOpacity=1.0,
     shouldFill=True,
     barWidthFillFraction=0.75,
@@ -890,3 +1292,6 @@ DEFAULT_OPTIONS = Option(
     titleFontSize=12,
     encoding='utf-8',
 )
+
+# shared read-only layer every chart starts from
+FROZEN_DEFAULT_OPTIONS = DEFAULT_OPTIONS.freeze()
@@ -0,0 +1,248 @@
+# This file is part of PyCha.
+#
+# PyCha is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyCha is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyCha.  If not, see <http://www.gnu.org/licenses/>.
+
+import hashlib
+
+import numpy
+
+
+class Dataset(object):
+
+    """Columnar storage for the values of one data series.
+
+    The x, y and yerr values are kept in float64 arrays of the same length
+    so ranges and coordinates can be computed as whole-array operations.
+    yerr is None when the series has no error values.
+
+    The arrays live in buffers that grow geometrically, so append is
+    amortized O(1). The min/max of x and y are kept up to date while
+    items are appended and are only recomputed, lazily, after an extreme
+    value is removed or replaced. Use the methods of this class to change
+    the data: writing into the x and y arrays bypasses that bookkeeping.
+    """
+
+    def __init__(self, name, x=(), y=(), yerr=None):
+        self.name = name
+        self._x = numpy.array(x, dtype=numpy.float64).ravel()
+        self._y = numpy.array(y, dtype=numpy.float64).ravel()
+        if len(self._x) != len(self._y):
+            raise ValueError('Dataset "%s" has %d x values and %d y values'
+                             % (name, len(self._x), len(self._y)))
+        self._size = len(self._x)
+
+        if yerr is None:
+            self._yerr = None
+        else:
+            self._yerr = numpy.array(yerr, dtype=numpy.float64).ravel()
+            if len(self._yerr) != self._size:
+                raise ValueError('Dataset "%s" has %d y values and %d errors'
+                                 % (name, self._size, len(self._yerr)))
+
+        # running (minx, maxx, miny, maxy), None while it must be recomputed
+        self._ranges = None
+
+        # bumped on every change, used to cache the fingerprint
+        self._version = 0
+        self._fingerprint = None
+
+    @classmethod
+    def fromPoints(cls, name, store):
+        """Builds a dataset from a sequence of (x, y) or (x, y, yerr) items"""
+        if any(len(item) == 3 for item in store):
+            items = [tuple(item) if len(item) == 3 else tuple(item) + (0.0,)
+                     for item in store]
+            columns = numpy.array(items, dtype=numpy.float64).reshape(-1, 3)
+            return cls(name, columns[:, 0], columns[:, 1], columns[:, 2])
+
+        columns = numpy.array(store, dtype=numpy.float64).reshape(-1, 2)
+        return cls(name, columns[:, 0], columns[:, 1])
+
+    @property
+    def x(self):
+        return self._x[:self._size]
+
+    @property
+    def y(self):
+        return self._y[:self._size]
+
+    @property
+    def yerr(self):
+        if self._yerr is None:
+            return None
+        return self._yerr[:self._size]
+
+    def __len__(self):
+        return self._size
+
+    def __str__(self):
+        return '<pycha.dataset.Dataset "%s" (%d items)>' % (self.name,
+                                                            len(self))
+
+    def getYErr(self):
+        """Return the error values, using zeros if there are none"""
+        if self._yerr is None:
+            return numpy.zeros(self._size)
+        return self.yerr
+
+    def append(self, xval, yval, yerr=None):
+        """Adds one item at the end of the series"""
+        xval, yval = float(xval), float(yval)
+        if self._size == len(self._x):
+            self._grow(self._size + 1)
+        if yerr is not None and self._yerr is None:
+            self._yerr = numpy.zeros(len(self._x))
+
+        self._x[self._size] = xval
+        self._y[self._size] = yval
+        if self._yerr is not None:
+            self._yerr[self._size] = yerr or 0.0
+        self._size += 1
+        self._version += 1
+
+        if self._ranges is not None:
+            minx, maxx, miny, maxy = self._ranges
+            self._ranges = (min(minx, xval), max(maxx, xval),
+                            min(miny, yval), max(maxy, yval))
+
+    def extend(self, x, y, yerr=None):
+        """Adds several items at the end of the series"""
+        x = numpy.asarray(x, dtype=numpy.float64).ravel()
+        y = numpy.asarray(y, dtype=numpy.float64).ravel()
+        if len(x) != len(y):
+            raise ValueError('%d x values and %d y values given'
+                             % (len(x), len(y)))
+        if not len(x):
+            return
+
+        start, end = self._size, self._size + len(x)
+        if end > len(self._x):
+            self._grow(end)
+        if yerr is not None and self._yerr is None:
+            self._yerr = numpy.zeros(len(self._x))
+
+        self._x[start:end] = x
+        self._y[start:end] = y
+        if self._yerr is not None:
+            self._yerr[start:end] = 0.0 if yerr is None else yerr
+        self._size = end
+        self._version += 1
+
+        if self._ranges is not None:
+            minx, maxx, miny, maxy = self._ranges
+            self._ranges = (min(minx, float(x.min())),
+                            max(maxx, float(x.max())),
+                            min(miny, float(y.min())),
+                            max(maxy, float(y.max())))
+
+    def pop(self, index=-1):
+        """Removes the item at index and returns it as (x, y, yerr)"""
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError('Dataset index out of range')
+
+        item = (float(self._x[index]), float(self._y[index]),
+                0.0 if self._yerr is None else float(self._yerr[index]))
+
+        for buf in (self._x, self._y, self._yerr):
+            if buf is not None:
+                buf[index:self._size - 1] = buf[index + 1:self._size]
+        self._size -= 1
+        self._version += 1
+
+        self._invalidateRanges(item[0], item[1])
+        return item
+
+    def setItem(self, index, xval, yval, yerr=None):
+        """Replaces the item at index"""
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError('Dataset index out of range')
+        if yerr is not None and self._yerr is None:
+            self._yerr = numpy.zeros(len(self._x))
+
+        oldx, oldy = float(self._x[index]), float(self._y[index])
+        xval, yval = float(xval), float(yval)
+        self._x[index] = xval
+        self._y[index] = yval
+        if self._yerr is not None:
+            self._yerr[index] = yerr or 0.0
+        self._version += 1
+
+        self._invalidateRanges(oldx, oldy)
+        if self._ranges is not None:
+            minx, maxx, miny, maxy = self._ranges
+            self._ranges = (min(minx, xval), max(maxx, xval),
+                            min(miny, yval), max(maxy, yval))
+
+    def getFingerprint(self):
+        """Return a digest of the name and values of this dataset.
+
+        Two datasets with the same fingerprint draw the same way.
+        """
+        if self._fingerprint is None or self._fingerprint[0] != self._version:
+            digest = hashlib.sha1(repr(self.name).encode('utf-8'))
+            for column in (self.x, self.y, self.yerr):
+                if column is not None:
+                    digest.update(column.tobytes())
+                digest.update(b'|')
+            self._fingerprint = (self._version, digest.hexdigest())
+        return self._fingerprint[1]
+
+    def xRange(self):
+        """Return the (min, max) of the x values"""
+        return self._getRanges()[0:2]
+
+    def yRange(self):
+        """Return the (min, max) of the y values"""
+        return self._getRanges()[2:4]
+
+    def _getRanges(self):
+        if self._ranges is None:
+            if not self._size:
+                raise ValueError('Dataset "%s" is empty' % self.name)
+            x, y = self.x, self.y
+            self._ranges = (float(x.min()), float(x.max()),
+                            float(y.min()), float(y.max()))
+        return self._ranges
+
+    def _invalidateRanges(self, xval, yval):
+        """Forgets the ranges if (xval, yval) was one of their limits"""
+        if self._ranges is not None:
+            minx, maxx, miny, maxy = self._ranges
+            if xval in (minx, maxx) or yval in (miny, maxy):
+                self._ranges = None
+
+    def _grow(self, minCapacity):
+        capacity = max(minCapacity, 2 * len(self._x), 16)
+        for attr in ('_x', '_y', '_yerr'):
+            buf = getattr(self, attr)
+            if buf is not None:
+                newBuf = numpy.zeros(capacity)
+                newBuf[:self._size] = buf[:self._size]
+                setattr(self, attr, newBuf)
+
+
+def toDataset(dataset):
+    """Return dataset as a Dataset.
+
+    Besides Dataset instances the classic (name, [(x, y), ...]) pairs
+    are accepted.
+    """
+    if isinstance(dataset, Dataset):
+        return dataset
+    name, store = dataset
+    return Dataset.fromPoints(name, store)
@@ -0,0 +1,247 @@
+# This file is part of PyCha.
+#
+# PyCha is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyCha is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyCha.  If not, see <http://www.gnu.org/licenses/>.
+
+import math
+
+import numpy
+
+
+class ItemArray(object):
+
+    """Struct of arrays with the geometry of the items of a chart.
+
+    Every field is a float64 array with one value per item and the name of
+    the dataset of item i is names[series[i]]. Indexing and iterating
+    build the item objects (Point, Rect, ...) on demand, so renderers can
+    work with the arrays while other code keeps seeing objects.
+    """
+
+    fields = ()
+
+    def __init__(self, name=None, **columns):
+        size = 0
+        for field in self.fields:
+            if field in columns:
+                column = numpy.array(columns[field], dtype=numpy.float64)
+                setattr(self, field, column.ravel())
+                size = len(column)
+        for field in self.fields:
+            if field not in columns:
+                setattr(self, field, numpy.zeros(size))
+
+        self.names = [] if name is None else [name]
+        self.series = numpy.zeros(size, dtype=numpy.int32)
+
+    @classmethod
+    def fromSeries(cls, names, series, **columns):
+        """Builds an array whose item i belongs to dataset names[series[i]]"""
+        result = cls(**columns)
+        result.names = list(names)
+        result.series = numpy.asarray(series, dtype=numpy.int32)
+        return result
+
+    def __len__(self):
+        return len(self.series)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('%s index out of range' % type(self).__name__)
+        row = [float(getattr(self, field)[index]) for field in self.fields]
+        return self._makeItem(row, self.names[self.series[index]])
+
+    def __iter__(self):
+        columns = [getattr(self, field).tolist() for field in self.fields]
+        names = [self.names[i] for i in self.series.tolist()]
+        for row, name in zip(zip(*columns), names):
+            yield self._makeItem(row, name)
+
+    def _makeItem(self, row, name):
+        """Return the object for the field values in row"""
+        raise NotImplementedError
+
+    @classmethod
+    def concatenate(cls, arrays):
+        """Return a new array with the items of all the given arrays"""
+        result = cls()
+        if not arrays:
+            return result
+
+        for field in cls.fields:
+            setattr(result, field, numpy.concatenate(
+                [getattr(array, field) for array in arrays]))
+        offset, series = 0, []
+        for array in arrays:
+            series.append(array.series + offset)
+            offset += len(array.names)
+            result.names.extend(array.names)
+        result.series = numpy.concatenate(series)
+        return result
+
+    def split(self):
+        """Return a dict with the items of every dataset name.
+
+        The items must be grouped by series, as concatenate leaves them.
+        The arrays of a name used by a single series are views into this
+        array, so they share its memory.
+        """
+        bounds = numpy.searchsorted(self.series,
+                                    numpy.arange(len(self.names) + 1))
+        result = {}
+        for index, name in enumerate(self.names):
+            start, end = bounds[index], bounds[index + 1]
+            part = type(self)()
+            for field in self.fields:
+                setattr(part, field, getattr(self, field)[start:end])
+            part.names = [name]
+            part.series = numpy.zeros(end - start, dtype=numpy.int32)
+            if name in result:
+                result[name].extend(part)
+            else:
+                result[name] = part
+        return result
+
+    def extend(self, other):
+        """Appends the items of other, an array of the same class"""
+        for field in self.fields:
+            setattr(self, field, numpy.concatenate((getattr(self, field),
+                                                    getattr(other, field))))
+        self.series = numpy.concatenate((self.series,
+                                         other.series + len(self.names)))
+        self.names.extend(other.names)
+
+
+class Point(object):
+
+    __slots__ = ('x', 'y', 'xval', 'yval', 'name')
+
+    def __init__(self, x, y, xval, yval, name):
+        self.x, self.y = x, y
+        self.xval, self.yval = xval, yval
+        self.name = name
+
+    def __str__(self):
+        return "<pycha.line.Point@(%.2f, %.2f)>" % (self.x, self.y)
+
+
+class PointArray(ItemArray):
+
+    """The x, y, xval and yval of many Points"""
+
+    fields = ('x', 'y', 'xval', 'yval')
+
+    def _makeItem(self, row, name):
+        return Point(row[0], row[1], row[2], row[3], name)
+
+
+class Rect(object):
+
+    __slots__ = ('x', 'y', 'w', 'h', 'xval', 'yval', 'yerr', 'name')
+
+    def __init__(self, x, y, w, h, xval, yval, name, yerr=0.0):
+        self.x, self.y, self.w, self.h = x, y, w, h
+        self.xval, self.yval, self.yerr = xval, yval, yerr
+        self.name = name
+
+    def __str__(self):
+        return ("<pycha.bar.Rect@(%.2f, %.2f) %.2fx%.2f (%.2f, %.2f, %.2f) %s>"
+                % (self.x, self.y, self.w, self.h,
+                   self.xval, self.yval, self.yerr,
+                   self.name))
+
+
+class Envelope(Rect):
+
+    """A pixel column standing for all the bars of a dataset inside it.
+
+    The rectangle goes from the origin to the mean value (yval) and bounds
+    is the (x, y, w, h) area between the min and max values.
+    """
+
+    __slots__ = ('bounds',)
+
+    def __init__(self, x, y, w, h, xval, yval, name, bounds):
+        super(Envelope, self).__init__(x, y, w, h, xval, yval, name)
+        self.bounds = bounds
+
+
+class RectArray(ItemArray):
+
+    """The geometry and values of many Rects"""
+
+    fields = ('x', 'y', 'w', 'h', 'xval', 'yval', 'yerr')
+
+    def _makeItem(self, row, name):
+        x, y, w, h, xval, yval, yerr = row
+        return Rect(x, y, w, h, xval, yval, name, yerr)
+
+
+class EnvelopeArray(ItemArray):
+
+    """The geometry and values of many Envelopes"""
+
+    fields = ('x', 'y', 'w', 'h', 'xval', 'yval', 'bx', 'by', 'bw', 'bh')
+
+    def _makeItem(self, row, name):
+        x, y, w, h, xval, yval = row[:6]
+        return Envelope(x, y, w, h, xval, yval, name, tuple(row[6:]))
+
+
+class Slice(object):
+
+    __slots__ = ('name', 'fraction', 'xval', 'yval', 'startAngle', 'endAngle')
+
+    def __init__(self, name, fraction, xval, yval, angle):
+        self.name = name
+        self.fraction = fraction
+        self.xval = xval
+        self.yval = yval
+        self.startAngle = 2 * angle * math.pi
+        self.endAngle = 2 * (angle + fraction) * math.pi
+
+    def __str__(self):
+        return ("<pycha.pie.Slice from %.2f to %.2f (%.2f%%)>" %
+                (self.startAngle, self.endAngle, self.fraction))
+
+    def isBigEnough(self):
+        return abs(self.startAngle - self.endAngle) > 0.001
+
+    def draw(self, cx, centerx, centery, radius):
+        cx.new_path()
+        cx.move_to(centerx, centery)
+        cx.arc(centerx, centery, radius, -self.endAngle, -self.startAngle)
+        cx.close_path()
+
+    def getNormalisedAngle(self):
+        normalisedAngle = (self.startAngle + self.endAngle) / 2
+
+        if normalisedAngle > math.pi * 2:
+            normalisedAngle -= math.pi * 2
+        elif normalisedAngle < 0:
+            normalisedAngle += math.pi * 2
+
+        return normalisedAngle
+
+
+class SliceArray(ItemArray):
+
+    """The fraction, values and start angle (in turns) of many Slices"""
+
+    fields = ('fraction', 'xval', 'yval', 'angle')
+
+    def _makeItem(self, row, name):
+        fraction, xval, yval, angle = row
+        return Slice(name, fraction, int(xval), yval, angle)
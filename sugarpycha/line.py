@@ -15,29 +15,61 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with PyCha.  If not, see <http://www.gnu.org/licenses/>.
 
-from sugarpycha.chart import Chart
+from sugarpycha.chart import Chart, insideChart
 from sugarpycha.color import hex2rgb
+from sugarpycha.dataset import Dataset
+from sugarpycha.geometry import PointArray
+from sugarpycha.sampling import reduceSeries, simplify
 
 
 class LineChart(Chart):
 
     def __init__(self, surface=None, options={}, debug=False):
         super(LineChart, self).__init__(surface, options, debug)
-        self.points = []
+        self.points = PointArray()
+        self.seriesPoints = {}
 
     def _updateChart(self):
         """Evaluates measures for line charts"""
-        self.points = []
-
-        for i, (name, store) in enumerate(self.datasets):
-            for item in store:
-                xval, yval = item
-                x = (xval - self.minxval) * self.xscale
-                y = 1.0 - (yval - self.minyval) * self.yscale
-                point = Point(x, y, xval, yval, name)
-
-                if 0.0 <= point.x <= 1.0 and 0.0 <= point.y <= 1.0:
-                    self.points.append(point)
+        self.points = PointArray.concatenate(
+            [normalizePoints(self, self._downsample(dataset))
+             for dataset in self.datasets])
+        self.seriesPoints = self.points.split()
+
+    def _downsample(self, dataset):
+        """Return dataset reduced to the level of detail of the surface.
+
+        Nothing is done unless the downsample.mode option is set. The
+        'simplify' mode drops the items that move the line less than
+        downsample.tolerance pixels.
+        """
+        mode = self.options.downsample.mode
+        if mode is None or self.surface is None:
+            return dataset
+
+        if mode == 'simplify':
+            x, y = self._toSurface(dataset)
+            keep = simplify(x, y, self.options.downsample.tolerance)
+        else:
+            width = self.getSurfaceSize()[0]
+            threshold = int(width * self.options.downsample.pointsPerPixel)
+            if len(dataset) <= threshold:
+                return dataset
+            keep = reduceSeries(dataset.x, dataset.y, mode, threshold)
+
+        if len(keep) == len(dataset):
+            return dataset
+        return Dataset(dataset.name, dataset.x[keep], dataset.y[keep])
+
+    def _toSurface(self, dataset):
+        """Return the x and y of dataset in surface pixels.
+
+        The layout is not known yet, so the chart is taken as big as the
+        surface. The chart area is smaller, so this errs on keeping items.
+        """
+        width, height = self.getSurfaceSize()
+        return ((dataset.x - self.minxval) * (self.xscale * width),
+                (dataset.y - self.minyval) * (self.yscale * height))
 
     def _renderChart(self, cx):
         """Renders a line chart"""
@@ -53,23 +85,20 @@ class LineChart(Chart):
                 offset = (1.0 - self.origin) * self.layout.chart.h
                 cx.move_to(self.layout.chart.x, self.layout.chart.y + offset)
 
-            for point in self.points:
-                if point.name == storeName:
-                    if not self.options.shouldFill and firstPoint:
-                        # starts the first point of the line
-                        cx.move_to(point.x * self.layout.chart.w
-                                   + self.layout.chart.x,
-                                   point.y * self.layout.chart.h
-                                   + self.layout.chart.y)
-                        firstPoint = False
-                        continue
-                    cx.line_to(point.x * self.layout.chart.w
-                               + self.layout.chart.x,
-                               point.y * self.layout.chart.h
-                               + self.layout.chart.y)
-                    # we remember the last X coordinate to close the area
-                    # properly. See bug #4
-                    lastX = point.x
+            points = self.seriesPoints[storeName]
+            xs = points.x * self.layout.chart.w + self.layout.chart.x
+            ys = points.y * self.layout.chart.h + self.layout.chart.y
+            for x, y in zip(xs.tolist(), ys.tolist()):
+                if not self.options.shouldFill and firstPoint:
+                    # starts the first point of the line
+                    cx.move_to(x, y)
+                    firstPoint = False
+                    continue
+                cx.line_to(x, y)
+            if len(points):
+                # we remember the last X coordinate to close the area
+                # properly. See bug #4
+                lastX = float(points.x[-1])
 
             if self.options.shouldFill:
                 # Close the path to the start point
@@ -117,13 +146,22 @@ class LineChart(Chart):
 
         cx.restore()
 
-
-class Point(object):
-
-    def __init__(self, x, y, xval, yval, name):
-        self.x, self.y = x, y
-        self.xval, self.yval = xval, yval
-        self.name = name
-
-    def __str__(self):
-        return "<pycha.line.Point@(%.2f, %.2f)>" % (self.x, self.y)
+    def _getItemBoxes(self, tolerance):
+        chart = self.layout.chart
+        x = self.points.x * chart.w + chart.x
+        y = self.points.y * chart.h + chart.y
+        return self.points, (x - tolerance, y - tolerance,
+                             x + tolerance, y + tolerance)
+
+
+def normalizePoints(chart, dataset):
+    """Return a PointArray with the points of dataset inside the chart area.
+
+    The coordinates are normalized to the [0, 1] range using the scales
+    computed by chart._updateXY.
+    """
+    x = (dataset.x - chart.minxval) * chart.xscale
+    y = 1.0 - (dataset.y - chart.minyval) * chart.yscale
+    visible = insideChart(x, y)
+    return PointArray(dataset.name, x=x[visible], y=y[visible],
+                      xval=dataset.x[visible], yval=dataset.y[visible])
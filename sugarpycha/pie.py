@@ -18,38 +18,42 @@
 import math
 
 import cairo
+import numpy
 
 from sugarpycha.chart import Chart, Option, Layout, Area, get_text_extents
+from sugarpycha.chart import textExtentsCache
 from sugarpycha.color import hex2rgb
+from sugarpycha.geometry import SliceArray
 
 
 class PieChart(Chart):
 
+    itemTolerance = 0.0
+
     def __init__(self, surface=None, options={}, debug=False):
         super(PieChart, self).__init__(surface, options, debug)
-        self.slices = []
+        self.slices = SliceArray()
         self.centerx = 0
         self.centery = 0
         self.layout = PieLayout(self.slices)
 
     def _updateChart(self):
         """Evaluates measures for pie charts"""
-        slices = [dict(name=key,
-                       value=(i, value[0][1]))
-                  for i, (key, value) in enumerate(self.datasets)]
-
-        s = float(sum([slice['value'][1] for slice in slices]))
-
-        fraction = angle = 0.0
-
-        del self.slices[:]
-        for slice in slices:
-            if slice['value'][1] > 0:
-                angle += fraction
-                fraction = slice['value'][1] / s
-                self.slices.append(Slice(slice['name'], fraction,
-                                         slice['value'][0], slice['value'][1],
-                                         angle))
+        values = numpy.array([float(dataset.y[0])
+                              for dataset in self.datasets])
+        s = float(sum(values.tolist()))
+
+        # only positive values get a slice, each one starts where the
+        # previous one ends
+        xval = numpy.flatnonzero(values > 0)
+        fraction = values[xval] / s
+        angle = numpy.zeros(len(fraction))
+        numpy.cumsum(fraction[:-1], out=angle[1:])
+
+        self.slices = SliceArray.fromSeries(
+            [dataset.name for dataset in self.datasets], xval,
+            fraction=fraction, xval=xval, yval=values[xval], angle=angle)
+        self.layout.slices = self.slices
 
     def _updateTicks(self):
         """Evaluates pie ticks"""
@@ -122,6 +126,12 @@ class PieChart(Chart):
                 cx.line_to(x, y)
                 cx.stroke()
 
+    def _makeItemLocator(self, tolerance):
+        centerx = self.layout.chart.x + self.layout.chart.w * 0.5
+        centery = self.layout.chart.y + self.layout.chart.h * 0.5
+        return SliceLocator(self.slices, centerx, centery,
+                            self.layout.radius, tolerance)
+
     def _renderAxis(self, cx):
         """Renders the axis for pie charts"""
         if self.options.axis.x.hide or not self.xticks:
@@ -151,7 +161,9 @@ class PieChart(Chart):
             label = tick[1]
             x, y, w, h = self.layout.ticks[i]
 
-            xb, yb, width, height, xa, ya = cx.text_extents(label)
+            xb, yb, width, height, xa, ya = textExtentsCache.get(
+                cx, label, self.options.axis.tickFont,
+                self.options.axis.tickFontSize)
 
             # draw label with text tick[1]
             cx.move_to(x - xb, y - yb)
@@ -159,38 +171,29 @@ class PieChart(Chart):
             self.xlabels.append(label)
 
 
-class Slice(object):
-
-    def __init__(self, name, fraction, xval, yval, angle):
-        self.name = name
-        self.fraction = fraction
-        self.xval = xval
-        self.yval = yval
-        self.startAngle = 2 * angle * math.pi
-        self.endAngle = 2 * (angle + fraction) * math.pi
+class SliceLocator(object):
 
-    def __str__(self):
-        return ("<pycha.pie.Slice from %.2f to %.2f (%.2f%%)>" %
-                (self.startAngle, self.endAngle, self.fraction))
+    """Finds the Slice drawn at a device coordinate, see ItemLocator"""
 
-    def isBigEnough(self):
-        return abs(self.startAngle - self.endAngle) > 0.001
-
-    def draw(self, cx, centerx, centery, radius):
-        cx.new_path()
-        cx.move_to(centerx, centery)
-        cx.arc(centerx, centery, radius, -self.endAngle, -self.startAngle)
-        cx.close_path()
-
-    def getNormalisedAngle(self):
-        normalisedAngle = (self.startAngle + self.endAngle) / 2
+    def __init__(self, slices, centerx, centery, radius, tolerance):
+        self.slices = slices
+        self.centerx, self.centery = centerx, centery
+        self.radius = radius
+        self.tolerance = tolerance
+        self.angles = 2 * slices.angle * math.pi
 
-        if normalisedAngle > math.pi * 2:
-            normalisedAngle -= math.pi * 2
-        elif normalisedAngle < 0:
-            normalisedAngle += math.pi * 2
+    def getItemAt(self, x, y):
+        """Return the Slice drawn at (x, y) or None"""
+        dx, dy = x - self.centerx, y - self.centery
+        if math.hypot(dx, dy) > self.radius + self.tolerance:
+            return None
 
-        return normalisedAngle
+        # slices are drawn counterclockwise and cairo's y axis points down
+        angle = -math.atan2(dy, dx) % (2 * math.pi)
+        index = int(numpy.searchsorted(self.angles, angle, 'right')) - 1
+        if index < 0 or angle > self.slices[index].endAngle:
+            return None
+        return self.slices[index]
 
 
 class PieLayout(Layout):
@@ -213,7 +216,29 @@ class PieLayout(Layout):
 
         self._lines = []
 
-    def update(self, cx, options, width, height, xticks, yticks):
+        # inputs of the last computed geometry
+        self._fingerprint = None
+
+    def getGeometry(self):
+        """Return the position and size of every area as a tuple"""
+        return (super(PieLayout, self).getGeometry()
+                + (self.radius, tuple(self.ticks)))
+
+    def _getFingerprint(self, options, width, height, xticks, yticks):
+        """Return the inputs the geometry depends on"""
+        return (width, height,
+                tuple(options.padding.items()),
+                options.title, options.titleFont, options.titleFontSize,
+                options.encoding,
+                options.axis.tickFont, options.axis.tickFontSize,
+                tuple(xticks),
+                tuple([(slice.xval, slice.startAngle, slice.endAngle)
+                       for slice in self.slices]))
+
+    def _compute(self, cx, options, width, height, xticks, yticks):
+        self.ticks = []
+        self._lines = []
+
         self.title.x = options.padding.left
         self.title.y = options.padding.top
         self.title.w = width - (options.padding.left + options.padding.right)
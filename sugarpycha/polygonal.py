@@ -18,33 +18,27 @@
 import math
 
 import cairo
+import numpy
 
-from sugarpycha.chart import Chart
-from sugarpycha.line import Point
+from sugarpycha.chart import Chart, textExtentsCache
+from sugarpycha.geometry import PointArray
+from sugarpycha.line import normalizePoints
 from sugarpycha.color import hex2rgb
 from sugarpycha.utils import safe_unicode
-import collections
 
 
 class PolygonalChart(Chart):
 
     def __init__(self, surface=None, options={}):
         super(PolygonalChart, self).__init__(surface, options)
-        self.points = []
+        self.points = PointArray()
+        self.seriesPoints = {}
 
     def _updateChart(self):
         """Evaluates measures for polygonal charts"""
-        self.points = []
-
-        for i, (name, store) in enumerate(self.datasets):
-            for item in store:
-                xval, yval = item
-                x = (xval - self.minxval) * self.xscale
-                y = 1.0 - (yval - self.minyval) * self.yscale
-                point = Point(x, y, xval, yval, name)
-
-                if 0.0 <= point.x <= 1.0 and 0.0 <= point.y <= 1.0:
-                    self.points.append(point)
+        self.points = PointArray.concatenate(
+            [normalizePoints(self, dataset) for dataset in self.datasets])
+        self.seriesPoints = self.points.split()
 
     def _renderBackground(self, cx):
         """Renders the background area of the chart"""
@@ -143,7 +137,7 @@ class PolygonalChart(Chart):
 
         count = len(self.yticks)
 
-        if isinstance(tick, collections.Callable):
+        if callable(tick):
             return
 
         x = center[0]
@@ -161,7 +155,8 @@ class PolygonalChart(Chart):
         cx.set_font_size(self.options.axis.tickFontSize)
 
         label = safe_unicode(tick[1], self.options.encoding)
-        extents = cx.text_extents(label)
+        extents = textExtentsCache.get(cx, label, self.options.axis.tickFont,
+                                       self.options.axis.tickFontSize)
         labelWidth = extents[2]
         labelHeight = extents[3]
 
@@ -245,7 +240,7 @@ class PolygonalChart(Chart):
 
     def _renderXTick(self, cx, i, fontAscent, center):
         tick = self.xticks[i]
-        if isinstance(tick, collections.Callable):
+        if callable(tick):
             return
 
         count = len(self.xticks)
@@ -255,7 +250,8 @@ class PolygonalChart(Chart):
         cx.set_font_size(self.options.axis.tickFontSize)
 
         label = safe_unicode(tick[1], self.options.encoding)
-        extents = cx.text_extents(label)
+        extents = textExtentsCache.get(cx, label, self.options.axis.tickFont,
+                                       self.options.axis.tickFontSize)
         labelWidth = extents[2]
         labelHeight = extents[3]
 
@@ -308,25 +304,25 @@ class PolygonalChart(Chart):
 
             firstPointCoord = None
 
-            for index, point in enumerate(self.points):
-                if point.name == storeName:
-                    offset1 = index * 2 * math.pi / count
-                    offset = math.pi / 2 - offset1
+            ys = self.seriesPoints[storeName].y.tolist()
+            for index, pointY in enumerate(ys):
+                offset1 = index * 2 * math.pi / count
+                offset = math.pi / 2 - offset1
 
-                    rad = (self.layout.chart.h / 2) * (1 - point.y)
+                rad = (self.layout.chart.h / 2) * (1 - pointY)
 
-                    x = centerx - math.cos(offset) * rad
-                    y = centery - math.sin(offset) * rad
+                x = centerx - math.cos(offset) * rad
+                y = centery - math.sin(offset) * rad
 
-                    if firstPointCoord is None:
-                        firstPointCoord = (x, y)
+                if firstPointCoord is None:
+                    firstPointCoord = (x, y)
 
-                    if not self.options.shouldFill and firstPoint:
-                        # starts the first point of the line
-                        cx.move_to(x, y)
-                        firstPoint = False
-                        continue
-                    cx.line_to(x, y)
+                if not self.options.shouldFill and firstPoint:
+                    # starts the first point of the line
+                    cx.move_to(x, y)
+                    firstPoint = False
+                    continue
+                cx.line_to(x, y)
 
             if firstPointCoord is not None:
                 cx.line_to(firstPointCoord[0], firstPointCoord[1])
@@ -371,3 +367,24 @@ class PolygonalChart(Chart):
             for key in self._getDatasetsKeys():
                 preparePath(key)
         cx.restore()
+
+    def _getItemBoxes(self, tolerance):
+        if not self.points:
+            return super(PolygonalChart, self)._getItemBoxes(tolerance)
+
+        count = len(self.points) / len(self.datasets)
+        centerx = self.layout.chart.x + self.layout.chart.w / 2
+        centery = self.layout.chart.y + self.layout.chart.h / 2
+
+        items, x, y = PointArray(), [], []
+        for points in self.seriesPoints.values():
+            index = numpy.arange(len(points))
+            offset = math.pi / 2 - index * 2 * math.pi / count
+            rad = (self.layout.chart.h / 2) * (1 - points.y)
+            x.append(centerx - numpy.cos(offset) * rad)
+            y.append(centery - numpy.sin(offset) * rad)
+            items.extend(points)
+
+        x, y = numpy.concatenate(x), numpy.concatenate(y)
+        return items, (x - tolerance, y - tolerance,
+                       x + tolerance, y + tolerance)
@@ -0,0 +1,196 @@
+# This file is part of PyCha.
+#
+# PyCha is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyCha is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyCha.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Level of detail reduction for series with more items than pixels.
+
+Line reductions return the sorted indices of the items to keep, so the
+caller can pick the same items from any of the dataset columns. Bars are
+aggregated instead, see columnStats.
+
+simplify and thinPoints work on device coordinates and drop the items
+that would not change the drawing by more than a tolerance. They suit
+vector output, where every item kept ends up in the file.
+"""
+
+import numpy
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets downsampling.
+
+    Keeps the first and last items and, for each of threshold - 2 equally
+    sized buckets, the item that forms the largest triangle with the item
+    kept in the previous bucket and the average of the next bucket.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return numpy.arange(n)
+
+    edges = numpy.linspace(1, n - 1, threshold - 1).astype(int)
+    edges[-1] = n - 1
+    indices = numpy.empty(threshold, dtype=int)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    selected = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            nextStart, nextEnd = edges[i + 1], edges[i + 2]
+        else:
+            nextStart, nextEnd = n - 1, n
+        avgx = x[nextStart:nextEnd].mean()
+        avgy = y[nextStart:nextEnd].mean()
+
+        ax, ay = x[selected], y[selected]
+        areas = numpy.abs((ax - avgx) * (y[start:end] - ay)
+                          - (ax - x[start:end]) * (avgy - ay))
+        selected = start + int(areas.argmax())
+        indices[i + 1] = selected
+
+    return indices
+
+
+def minMax(x, y, buckets):
+    """Min/max bucketing.
+
+    Splits the series in buckets along x (or along the item order if x is
+    not sorted) and keeps the lowest and highest item of each bucket, plus
+    the first and last items of the series.
+    """
+    n = len(x)
+    if buckets < 1 or n <= 2 * buckets:
+        return numpy.arange(n)
+
+    span = x[-1] - x[0]
+    if span > 0 and numpy.all(x[1:] >= x[:-1]):
+        bucket = ((x - x[0]) * (buckets / span)).astype(int)
+        numpy.minimum(bucket, buckets - 1, out=bucket)
+    else:
+        bucket = numpy.arange(n) * buckets // n
+
+    starts = numpy.flatnonzero(numpy.r_[True, bucket[1:] != bucket[:-1]])
+    ends = numpy.r_[starts[1:] - 1, n - 1]
+
+    # inside each bucket the items are ordered by y
+    order = numpy.lexsort((y, bucket))
+    keep = numpy.concatenate(([0, n - 1], order[starts], order[ends]))
+    return numpy.unique(keep)
+
+
+def douglasPeucker(x, y, tolerance):
+    """Douglas-Peucker polyline simplification.
+
+    Keeps the first and last items and, recursively, the item farthest
+    from the line through the items kept around it while it is more than
+    tolerance away.
+    """
+    n = len(x)
+    if n < 3 or tolerance <= 0:
+        return numpy.arange(n)
+
+    keep = numpy.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        dx, dy = x[end] - x[start], y[end] - y[start]
+        px = x[start + 1:end] - x[start]
+        py = y[start + 1:end] - y[start]
+        length = numpy.hypot(dx, dy)
+        if length > 0:
+            distance = numpy.abs(dx * py - dy * px) / length
+        else:
+            distance = numpy.hypot(px, py)
+        farthest = int(distance.argmax())
+        if distance[farthest] > tolerance:
+            farthest += start + 1
+            keep[farthest] = True
+            stack.append((start, farthest))
+            stack.append((farthest, end))
+
+    return numpy.flatnonzero(keep)
+
+
+def simplify(x, y, tolerance):
+    """Return the items of a line that draw it within tolerance.
+
+    Long series are first reduced with minMax to one bucket per tolerance
+    along x, which bounds the work of douglasPeucker.
+    """
+    n = len(x)
+    if n < 3 or tolerance <= 0:
+        return numpy.arange(n)
+
+    buckets = int(abs(x[-1] - x[0]) / tolerance) + 1
+    keep = minMax(x, y, buckets)
+    return keep[douglasPeucker(x[keep], y[keep], tolerance)]
+
+
+def thinPoints(x, y, tolerance):
+    """Return the first item in each tolerance sized cell.
+
+    Meant for scatterplots: the symbols of the other items in a cell are
+    drawn, within tolerance, where the first one is.
+    """
+    n = len(x)
+    if n < 2 or tolerance <= 0:
+        return numpy.arange(n)
+
+    column = ((x - x.min()) / tolerance).astype(numpy.int64)
+    row = ((y - y.min()) / tolerance).astype(numpy.int64)
+    cell = column * (int(row.max()) + 1) + row
+    first = numpy.unique(cell, return_index=True)[1]
+    first.sort()
+    return first
+
+
+def reduceSeries(x, y, mode, threshold):
+    """Return the indices of the items to draw using the given mode.
+
+    mode is 'lttb' or 'minmax' and threshold the approximate number of
+    items to keep.
+    """
+    if mode == 'lttb':
+        return lttb(x, y, threshold)
+    elif mode == 'minmax':
+        return minMax(x, y, threshold // 2)
+    raise ValueError('Invalid downsample mode "%s"' % mode)
+
+
+def columnStats(position, values, columns):
+    """Aggregates values by pixel column.
+
+    position holds the [0, 1] coordinate of each item, which falls in one
+    of columns equal slices. values may have several columns of its own.
+    Return (column, mean, low, high) arrays for the non empty columns.
+    """
+    column = numpy.minimum((position * columns).astype(int), columns - 1)
+    order = numpy.argsort(column, kind='stable')
+    column = column[order]
+    values = values[order]
+    if not len(column):
+        return column, values, values, values
+
+    starts = numpy.flatnonzero(numpy.r_[True, column[1:] != column[:-1]])
+    counts = numpy.diff(numpy.r_[starts, len(column)])
+    if values.ndim > 1:
+        counts = counts[:, numpy.newaxis]
+    mean = numpy.add.reduceat(values, starts) / counts
+    low = numpy.minimum.reduceat(values, starts)
+    high = numpy.maximum.reduceat(values, starts)
+    return column[starts], mean, low, high
@@ -17,22 +17,43 @@
 
 import math
 
+from sugarpycha.dataset import Dataset
 from sugarpycha.line import LineChart
+from sugarpycha.sampling import thinPoints
 
 
 class ScatterplotChart(LineChart):
 
-    def _renderChart(self, cx):
-        """Renders a scatterplot"""
+    def _downsample(self, dataset):
+        """Scatterplots draw every point, there is no line to simplify.
 
-        def drawSymbol(point, size):
-            ox = point.x * self.layout.chart.w + self.layout.chart.x
-            oy = point.y * self.layout.chart.h + self.layout.chart.y
-            cx.arc(ox, oy, size, 0.0, 2 * math.pi)
-            cx.fill()
+        With the 'simplify' mode the points closer than
+        downsample.tolerance pixels to one already drawn are dropped.
+        """
+        if self.options.downsample.mode != 'simplify' or self.surface is None:
+            return dataset
+
+        keep = thinPoints(*self._toSurface(dataset),
+                          tolerance=self.options.downsample.tolerance)
+        if len(keep) == len(dataset):
+            return dataset
+        return Dataset(dataset.name, dataset.x[keep], dataset.y[keep])
 
-        for key in self._getDatasetsKeys():
+    def _renderChart(self, cx):
+        """Renders a scatterplot.
+
+        The symbols of each dataset go into a single path that is filled
+        once, instead of filling every symbol on its own.
+        """
+        chartX, chartY = self.layout.chart.x, self.layout.chart.y
+        chartW, chartH = self.layout.chart.w, self.layout.chart.h
+        size = self.options.stroke.width
+        for key, points in self.seriesPoints.items():
+            xs = points.x * chartW + chartX
+            ys = points.y * chartH + chartY
+            cx.new_path()
+            for x, y in zip(xs.tolist(), ys.tolist()):
+                cx.new_sub_path()
+                cx.arc(x, y, size, 0.0, 2 * math.pi)
             cx.set_source_rgb(*self.colorScheme[key])
-            for point in self.points:
-                if point.name == key:
-                    drawSymbol(point, self.options.stroke.width)
+            cx.fill()
@@ -0,0 +1,125 @@
+# This file is part of PyCha.
+#
+# PyCha is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyCha is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyCha.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy
+
+
+class GridIndex(object):
+
+    """Uniform grid over axis aligned boxes, used for point lookups.
+
+    The cells are about twice as big as the median box, so most boxes are
+    stored in one to four cells and a lookup only tests the boxes stored
+    in the cell under the point.
+    """
+
+    maxCells = 1024  # per axis
+
+    def __init__(self, x0, y0, x1, y1):
+        self.x0 = numpy.asarray(x0, dtype=numpy.float64)
+        self.y0 = numpy.asarray(y0, dtype=numpy.float64)
+        self.x1 = numpy.asarray(x1, dtype=numpy.float64)
+        self.y1 = numpy.asarray(y1, dtype=numpy.float64)
+        self.size = len(self.x0)
+        if not self.size:
+            return
+
+        self.left, self.top = self.x0.min(), self.y0.min()
+        self.nx, self.cellW = self._getCells(self.x1.max() - self.left,
+                                             self.x1 - self.x0)
+        self.ny, self.cellH = self._getCells(self.y1.max() - self.top,
+                                             self.y1 - self.y0)
+
+        cx0, cx1 = self._column(self.x0), self._column(self.x1)
+        cy0, cy1 = self._row(self.y0), self._row(self.y1)
+        spanX = cx1 - cx0 + 1
+        counts = spanX * (cy1 - cy0 + 1)
+
+        # one entry per (box, cell) pair
+        box = numpy.repeat(numpy.arange(self.size), counts)
+        local = (numpy.arange(counts.sum())
+                 - numpy.repeat(numpy.cumsum(counts) - counts, counts))
+        spanX = spanX[box]
+        cell = ((cy0[box] + local // spanX) * self.nx
+                + cx0[box] + local % spanX)
+
+        self.boxes = box[numpy.argsort(cell)]
+        self.starts = numpy.zeros(self.nx * self.ny + 1, dtype=numpy.int64)
+        numpy.cumsum(numpy.bincount(cell, minlength=self.nx * self.ny),
+                     out=self.starts[1:])
+
+    def _getCells(self, span, sizes):
+        size = max(2 * float(numpy.median(sizes)), span / self.maxCells)
+        if size <= 0:
+            return 1, 1.0
+        count = int(span / size) + 1
+        return count, size
+
+    def _column(self, x):
+        column = ((x - self.left) / self.cellW).astype(numpy.int64)
+        return numpy.clip(column, 0, self.nx - 1)
+
+    def _row(self, y):
+        row = ((y - self.top) / self.cellH).astype(numpy.int64)
+        return numpy.clip(row, 0, self.ny - 1)
+
+    def query(self, x, y):
+        """Return the index of the box that contains (x, y).
+
+        If several boxes contain it, the one with the closest center wins,
+        and among those the last one, which is drawn on top. Return -1 when
+        no box contains the point.
+        """
+        if not self.size:
+            return -1
+        column = int((x - self.left) // self.cellW)
+        row = int((y - self.top) // self.cellH)
+        if not (0 <= column < self.nx and 0 <= row < self.ny):
+            return -1
+
+        cell = row * self.nx + column
+        candidates = self.boxes[self.starts[cell]:self.starts[cell + 1]]
+        x0, x1 = self.x0[candidates], self.x1[candidates]
+        y0, y1 = self.y0[candidates], self.y1[candidates]
+        inside = (x0 <= x) & (x <= x1) & (y0 <= y) & (y <= y1)
+        if not inside.any():
+            return -1
+
+        candidates = candidates[inside]
+        distance = (((x0 + x1)[inside] / 2 - x) ** 2
+                    + ((y0 + y1)[inside] / 2 - y) ** 2)
+        return int(candidates[distance == distance.min()].max())
+
+
+class ItemLocator(object):
+
+    """Finds the item drawn at a device coordinate of a rendered chart.
+
+    It holds the items and a GridIndex of their boxes as they were after a
+    render. The chart builds new items on the next render and leaves these
+    alone, so a locator can be used from another thread meanwhile.
+    """
+
+    def __init__(self, items, boxes, tolerance):
+        self.items = items
+        self.tolerance = tolerance
+        self.index = GridIndex(*boxes)
+
+    def getItemAt(self, x, y):
+        """Return the item whose box contains (x, y) or None"""
+        index = self.index.query(x, y)
+        if index < 0:
+            return None
+        return self.items[index]
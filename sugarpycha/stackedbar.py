@@ -15,9 +15,12 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with PyCha.  If not, see <http://www.gnu.org/licenses/>.
 
-from sugarpycha.bar import BarChart, VerticalBarChart, HorizontalBarChart, Rect
+import numpy
+
+from sugarpycha.bar import BarChart, VerticalBarChart, HorizontalBarChart
 from sugarpycha.chart import uniqueIndices
-from functools import reduce
+from sugarpycha.dataset import Dataset
+from sugarpycha.geometry import EnvelopeArray, RectArray
 
 
 class StackedBarChart(BarChart):
@@ -25,6 +28,7 @@ class StackedBarChart(BarChart):
     def __init__(self, surface=None, options={}, debug=False):
         super(StackedBarChart, self).__init__(surface, options, debug)
         self.barWidth = 0.0
+        self.bases = []
 
     def _updateXY(self):
         super(StackedBarChart, self)._updateXY()
@@ -32,22 +36,22 @@ class StackedBarChart(BarChart):
         # need n + 1 divisions on the x axis
         self.xscale = 1 / (self.xrange + 1.0)
 
+        self.bases, low, high = stackValues(self.datasets)
+
         if self.options.axis.y.range is None:
-            # Fix the yscale as we accumulate the y values
-            stores = self._getDatasetsValues()
-            n_stores = len(stores)
-            flat_y = [pair[1] for pair in reduce(lambda a, b: a + b, stores)]
-            store_size = len(flat_y) / n_stores
-            accum = [sum(flat_y[j]for j in range(i,
-                                                 i + store_size * n_stores,
-                                                 store_size))
-                     for i in range(len(flat_y) / n_stores)]
-            self.yrange = float(max(accum))
+            # Fix the y axis as we accumulate the y values
+            self.minyval, self.maxyval = low, high
+            self.yrange = high - low
             if self.yrange == 0:
                 self.yscale = 1.0
             else:
                 self.yscale = 1.0 / self.yrange
 
+            if low < 0:
+                self.origin = abs(low) * self.yscale
+            else:
+                self.origin = 0.0
+
     def _updateChart(self):
         """Evaluates measures for vertical bars"""
         stores = self._getDatasetsValues()
@@ -63,7 +67,14 @@ class StackedBarChart(BarChart):
         self.barWidth = k * self.options.barWidthFillFraction
         self.barMargin = k * (1.0 - self.options.barWidthFillFraction) / 2
 
-        self.bars = []
+        self.columns = self._getColumnCount(len(uniqx))
+        self.bars = EnvelopeArray() if self.columns else RectArray()
+
+    def _stackEnvelopes(self, aggregates):
+        # the column means stack like the items, aligned on their column
+        means = [Dataset(dataset.name, aggregate[0], aggregate[2])
+                 for dataset, aggregate in zip(self.datasets, aggregates)]
+        return stackValues(means)[0]
 
 
 class StackedVerticalBarChart(StackedBarChart, VerticalBarChart):
@@ -71,27 +82,19 @@ class StackedVerticalBarChart(StackedBarChart, VerticalBarChart):
     def _updateChart(self):
         """Evaluates measures for vertical bars"""
         super(StackedVerticalBarChart, self)._updateChart()
+        if self.columns:
+            self._updateEnvelopes(stacked=True)
+            return
 
-        accumulated_heights = {}
-        for i, (name, store) in enumerate(self.datasets):
-            for item in store:
-                xval, yval = item
-                x = ((xval - self.minxval) * self.xscale) + self.barMargin
-                w = self.barWidth
-                h = abs(yval) * self.yscale
-                if yval > 0:
-                    y = (1.0 - h) - self.origin
-                else:
-                    y = 1 - self.origin
-
-                accumulated_height = accumulated_heights.setdefault(xval, 0)
-                y -= accumulated_height
-                accumulated_heights[xval] += h
-
-                rect = Rect(x, y, w, h, xval, yval, name)
-
-                if (0.0 <= rect.x <= 1.0) and (0.0 <= rect.y <= 1.0):
-                    self.bars.append(rect)
+        bars = []
+        for dataset, base in zip(self.datasets, self.bases):
+            x = ((dataset.x - self.minxval) * self.xscale) + self.barMargin
+            h = numpy.abs(dataset.y) * self.yscale
+            top = numpy.maximum(base, base + dataset.y)
+            y = (1.0 - self.origin) - top * self.yscale
+            bars.append(self._makeBars(dataset, x, y, self.barWidth, h,
+                                       yerr=0.0))
+        self.bars = RectArray.concatenate(bars)
 
 
 class StackedHorizontalBarChart(StackedBarChart, HorizontalBarChart):
@@ -99,24 +102,70 @@ class StackedHorizontalBarChart(StackedBarChart, HorizontalBarChart):
     def _updateChart(self):
         """Evaluates measures for horizontal bars"""
         super(StackedHorizontalBarChart, self)._updateChart()
-
-        accumulated_widths = {}
-        for i, (name, store) in enumerate(self.datasets):
-            for item in store:
-                xval, yval = item
-                y = ((xval - self.minxval) * self.xscale) + self.barMargin
-                h = self.barWidth
-                w = abs(yval) * self.yscale
-                if yval > 0:
-                    x = self.origin
-                else:
-                    x = self.origin - w
-
-                accumulated_width = accumulated_widths.setdefault(xval, 0)
-                x += accumulated_width
-                accumulated_widths[xval] += w
-
-                rect = Rect(x, y, w, h, xval, yval, name)
-
-                if (0.0 <= rect.x <= 1.0) and (0.0 <= rect.y <= 1.0):
-                    self.bars.append(rect)
+        if self.columns:
+            self._updateEnvelopes(stacked=True)
+            return
+
+        bars = []
+        for dataset, base in zip(self.datasets, self.bases):
+            y = ((dataset.x - self.minxval) * self.xscale) + self.barMargin
+            w = numpy.abs(dataset.y) * self.yscale
+            left = numpy.minimum(base, base + dataset.y)
+            x = self.origin + left * self.yscale
+            bars.append(self._makeBars(dataset, x, y, w, self.barWidth,
+                                       yerr=0.0))
+        self.bars = RectArray.concatenate(bars)
+
+
+def stackValues(datasets):
+    """Stacks the y values of datasets on top of each other.
+
+    Items are aligned on their x values, so the series may be ragged.
+    Positive values stack upwards from zero and negative values downwards,
+    each item on top of the items of the same sign stacked before it at
+    the same x.
+
+    Return (bases, low, high) where bases holds, for every dataset, the
+    value each item starts from, and low/high are the limits of the
+    stacks (always including zero).
+    """
+    if not datasets:
+        return [], 0.0, 0.0
+
+    first = datasets[0].x
+    if all(numpy.array_equal(dataset.x, first) for dataset in datasets):
+        # every series has the same x values: stack the rows of a matrix
+        y = numpy.array([dataset.y for dataset in datasets])
+        positive, negative = numpy.maximum(y, 0), numpy.minimum(y, 0)
+        positiveTop = numpy.cumsum(positive, axis=0)
+        negativeTop = numpy.cumsum(negative, axis=0)
+        bases = numpy.where(y >= 0, positiveTop - positive,
+                            negativeTop - negative)
+        return (list(bases), min(float(negativeTop.min()), 0.0),
+                max(float(positiveTop.max()), 0.0))
+
+    x = numpy.concatenate([dataset.x for dataset in datasets])
+    y = numpy.concatenate([dataset.y for dataset in datasets])
+    if not len(y):
+        return [dataset.y.copy() for dataset in datasets], 0.0, 0.0
+
+    # group the items by x, keeping the dataset order inside each group
+    order = numpy.argsort(x, kind='stable')
+    x, y = x[order], y[order]
+    starts = numpy.flatnonzero(numpy.r_[True, x[1:] != x[:-1]])
+    groupStart = numpy.repeat(starts, numpy.diff(numpy.r_[starts, len(y)]))
+
+    positive, negative = numpy.maximum(y, 0), numpy.minimum(y, 0)
+    positiveTop = numpy.cumsum(positive)
+    negativeTop = numpy.cumsum(negative)
+    positiveBase = positiveTop - positive
+    negativeBase = negativeTop - negative
+    positiveBase -= positiveBase[groupStart]
+    negativeBase -= negativeBase[groupStart]
+
+    bases = numpy.empty(len(y))
+    bases[order] = numpy.where(y >= 0, positiveBase, negativeBase)
+    ends = numpy.cumsum([len(dataset) for dataset in datasets])[:-1]
+    return (numpy.split(bases, ends),
+            min(float((negativeBase + negative).min()), 0.0),
+            max(float((positiveBase + positive).max()), 0.0))
@@ -0,0 +1,39 @@
+# This file is part of PyCha.
+#
+# PyCha is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyCha is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyCha.  If not, see <http://www.gnu.org/licenses/>.
+
+import pytest
+
+cairo = pytest.importorskip('cairo')
+
+from sugarpycha.bar import HorizontalBarChart, VerticalBarChart
+
+DATASETS = [('a', [(0, 1.0, 0.5), (1, 3.0, 0.2), (2, 2.0, 0.1)])]
+
+
+def renderBars(chartClass):
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 200, 200)
+    chart = chartClass(surface)
+    chart.addDataset(DATASETS)
+    chart.render()
+    return chart.bars
+
+
+def testVerticalBarsHaveNoErrors():
+    assert [bar.yerr for bar in renderBars(VerticalBarChart)] == [0.0] * 3
+
+
+def testHorizontalBarsKeepTheErrors():
+    errors = [bar.yerr for bar in renderBars(HorizontalBarChart)]
+    assert errors == [0.5, 0.2, 0.1]
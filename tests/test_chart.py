@@ -0,0 +1,71 @@
+# This file is part of PyCha.
+#
+# PyCha is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyCha is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyCha.  If not, see <http://www.gnu.org/licenses/>.
+
+import pytest
+
+pytest.importorskip('cairo')
+
+from sugarpycha.chart import niceNumber, niceTicks
+
+
+@pytest.mark.parametrize('value, rounded, expected', [
+    (0.7, True, 0.5),
+    (1.4, True, 1.0),
+    (1.6, True, 2.0),
+    (3.1, True, 5.0),
+    (7.1, True, 10.0),
+    (1.0, False, 1.0),
+    (1.01, False, 2.0),
+    (5.1, False, 10.0),
+    (0.03, True, 0.05),
+    (2500.0, False, 5000.0),
+])
+def testNiceNumber(value, rounded, expected):
+    assert niceNumber(value, rounded) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('low, high, count, minStep, expected', [
+    # negative to positive
+    (-7, 13, 5, 0.0, [-5.0, 0.0, 5.0, 10.0]),
+    (-0.25, 0.25, 4, 0.0, [-0.2, -0.1, 0.0, 0.1, 0.2]),
+    # sub-unit steps, without the rounding errors of k * step
+    (0.1, 0.3, 5, 0.0, [0.1, 0.15, 0.2, 0.25, 0.3]),
+    # large offsets
+    (1e6, 1e6 + 3, 5, 0.0, [1e6, 1e6 + 0.5, 1e6 + 1, 1e6 + 1.5, 1e6 + 2,
+                            1e6 + 2.5, 1e6 + 3]),
+    # minStep wins over the computed step
+    (0, 10, 5, 5.0, [0.0, 5.0, 10.0]),
+    (0.1, 0.3, 5, 0.1, [0.1, 0.2, 0.3]),
+    # the computed step wins over a smaller minStep
+    (0, 1, 3, 0.2, [0.0, 0.5, 1.0]),
+])
+def testNiceTicks(low, high, count, minStep, expected):
+    assert niceTicks(low, high, count, minStep) == expected
+
+
+@pytest.mark.parametrize('low, high, count', [
+    (3, 3, 5),
+    (5, 2, 5),
+    (0, 1, 0),
+])
+def testNiceTicksNoSpan(low, high, count):
+    assert niceTicks(low, high, count) == [low]
+
+
+def testNiceTicksStayInside():
+    for low, high in ((-1e-3, 7e-3), (123.4, 5678.9), (-50, -2)):
+        ticks = niceTicks(low, high, 10)
+        assert ticks and low <= ticks[0] and ticks[-1] <= high
+        assert ticks == sorted(set(ticks))
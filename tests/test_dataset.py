@@ -0,0 +1,91 @@
+# This file is part of PyCha.
+#
+# PyCha is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyCha is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyCha.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy
+import pytest
+
+from sugarpycha.dataset import Dataset
+
+
+def checkRanges(dataset):
+    assert dataset.xRange() == (dataset.x.min(), dataset.x.max())
+    assert dataset.yRange() == (dataset.y.min(), dataset.y.max())
+
+
+def extremeIndex(random, values):
+    # the first or the last of the items that hold the min or the max
+    limit = values.min() if random.rand() < 0.5 else values.max()
+    indexes = numpy.flatnonzero(values == limit)
+    return int(indexes[0] if random.rand() < 0.5 else indexes[-1])
+
+
+@pytest.mark.parametrize('seed', range(20))
+def testRangesFollowMutations(seed):
+    random = numpy.random.RandomState(seed)
+
+    def values(size=None):
+        # few distinct values, so the extremes are often repeated
+        return numpy.asarray(random.randint(-5, 6, size), dtype=float)
+
+    dataset = Dataset('test', values(3), values(3))
+    checkRanges(dataset)
+    for step in range(300):
+        action = random.randint(6)
+        if action == 0:
+            dataset.append(values(), values())
+        elif action == 1:
+            size = random.randint(1, 5)
+            dataset.extend(values(size), values(size))
+        elif action == 2 and len(dataset) > 1:
+            dataset.pop(random.randint(len(dataset)))
+        elif action == 3 and len(dataset) > 1:
+            column = dataset.x if random.rand() < 0.5 else dataset.y
+            dataset.pop(extremeIndex(random, column))
+        elif action == 4:
+            dataset.setItem(random.randint(len(dataset)), values(), values())
+        elif action == 5:
+            column = dataset.x if random.rand() < 0.5 else dataset.y
+            dataset.setItem(extremeIndex(random, column), values(), values())
+        checkRanges(dataset)
+
+
+def testPopExtreme():
+    dataset = Dataset('test', [0, 1, 2], [5, -3, 1])
+    assert dataset.yRange() == (-3, 5)
+    assert dataset.pop(0) == (0, 5, 0.0)
+    assert dataset.yRange() == (-3, 1)
+    assert dataset.xRange() == (1, 2)
+
+
+def testSetItemOverwritesExtreme():
+    dataset = Dataset('test', [0, 1, 2], [5, -3, 1])
+    assert dataset.yRange() == (-3, 5)
+    dataset.setItem(1, 1, 0)
+    assert dataset.yRange() == (0, 5)
+    dataset.setItem(0, 0, 2)
+    assert dataset.yRange() == (0, 2)
+    dataset.setItem(2, 7, 9)
+    assert dataset.xRange() == (0, 7)
+    assert dataset.yRange() == (0, 9)
+
+
+def testEmptyRange():
+    dataset = Dataset('test', [1], [2])
+    dataset.pop()
+    with pytest.raises(ValueError):
+        dataset.xRange()
+    dataset.append(3, 4)
+    assert dataset.xRange() == (3, 3)
+    assert dataset.yRange() == (4, 4)
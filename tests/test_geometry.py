@@ -0,0 +1,82 @@
+# This file is part of PyCha.
+#
+# PyCha is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyCha is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyCha.  If not, see <http://www.gnu.org/licenses/>.
+
+import gc
+import tracemalloc
+
+import numpy
+import pytest
+
+from sugarpycha.geometry import EnvelopeArray, PointArray, RectArray
+from sugarpycha.geometry import SliceArray
+
+ITEMS = 200000
+SERIES = 4
+
+# a float64 per field and the int32 series index, plus a little slack
+# for the array headers
+ARRAY_CLASSES = [
+    (PointArray, 4 * 8 + 4 + 2),
+    (RectArray, 7 * 8 + 4 + 2),
+    (EnvelopeArray, 10 * 8 + 4 + 2),
+    (SliceArray, 4 * 8 + 4 + 2),
+]
+
+
+def buildArray(arrayClass):
+    """Return the bytes per item held by an array of ITEMS items made of
+    SERIES concatenated series, like the charts build them"""
+    size = ITEMS // SERIES
+    columns = dict((field, numpy.arange(size, dtype=numpy.float64))
+                   for field in arrayClass.fields)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        parts = [arrayClass('series %d' % i, **columns)
+                 for i in range(SERIES)]
+        array = arrayClass.concatenate(parts)
+        del parts
+        gc.collect()
+        used = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    assert len(array) == ITEMS
+    return used / float(ITEMS), array
+
+
+@pytest.mark.parametrize('arrayClass, ceiling', ARRAY_CLASSES)
+def testBytesPerItem(arrayClass, ceiling):
+    bytesPerItem, array = buildArray(arrayClass)
+    assert bytesPerItem <= ceiling
+
+
+@pytest.mark.parametrize('arrayClass', [item[0] for item in ARRAY_CLASSES])
+def testSplitSharesMemory(arrayClass):
+    bytesPerItem, array = buildArray(arrayClass)
+    tracemalloc.start()
+    try:
+        parts = array.split()
+        used = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    assert len(parts) == SERIES
+    # only the series indexes of the parts are new arrays
+    assert used / float(ITEMS) <= 4 + 2
+
+
+@pytest.mark.parametrize('arrayClass', [item[0] for item in ARRAY_CLASSES])
+def testItemsHaveNoDict(arrayClass):
+    bytesPerItem, array = buildArray(arrayClass)
+    assert not hasattr(array[0], '__dict__')
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import os
+
+from rendercache import RenderCache
+
+
+def test_overwrite_keeps_the_size(tmp_path):
+    cache = RenderCache(str(tmp_path), max_size=1000)
+    cache.put('key', b'a' * 100)
+    for i in range(20):
+        cache.put('key', b'b' * 150)
+    cache.put('other', b'c' * 10)
+
+    assert cache.stats()['evictions'] == 0
+    assert cache.get('key') == b'b' * 150
+    assert cache._size == 160
+
+
+def test_get_keeps_an_image_evicted_after_the_read(tmp_path, monkeypatch):
+    cache = RenderCache(str(tmp_path))
+    cache.put('key', b'image')
+
+    def evicted(path):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(os, 'utime', evicted)
+    assert cache.get('key') == b'image'
+    assert cache.get('missing') is None
+    assert (cache.hits, cache.misses) == (1, 1)
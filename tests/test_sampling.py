@@ -0,0 +1,121 @@
+# This file is part of PyCha.
+#
+# PyCha is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyCha is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyCha.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy
+import pytest
+
+from sugarpycha.sampling import douglasPeucker, lttb, minMax
+
+
+def randomSeries(seed, n, sortedX=True):
+    random = numpy.random.RandomState(seed)
+    x = random.uniform(0, 100, n)
+    if sortedX:
+        x.sort()
+    # rounded, so there are ties between the extremes
+    y = numpy.round(random.standard_normal(n).cumsum(), 1)
+    return x, y
+
+
+def checkIndices(indices, n):
+    assert indices[0] == 0 and indices[-1] == n - 1
+    assert numpy.all(numpy.diff(indices) > 0)
+
+
+@pytest.mark.parametrize('n, threshold', [
+    (1000, 3), (1000, 10), (1000, 999), (5000, 700), (37, 20),
+])
+def testLttb(n, threshold):
+    x, y = randomSeries(n + threshold, n)
+    indices = lttb(x, y, threshold)
+    checkIndices(indices, n)
+    assert len(indices) == threshold
+
+
+@pytest.mark.parametrize('n, threshold', [(10, 10), (10, 50), (10, 2)])
+def testLttbKeepsEverything(n, threshold):
+    x, y = randomSeries(n, n)
+    assert list(lttb(x, y, threshold)) == list(range(n))
+
+
+@pytest.mark.parametrize('sortedX', [True, False])
+@pytest.mark.parametrize('n, buckets', [
+    (1000, 1), (1000, 7), (1000, 100), (5000, 300), (41, 20),
+])
+def testMinMax(n, buckets, sortedX):
+    x, y = randomSeries(n * buckets, n, sortedX)
+    indices = minMax(x, y, buckets)
+    checkIndices(indices, n)
+    assert len(indices) <= 2 * buckets + 2
+
+    if sortedX:
+        bucket = ((x - x[0]) * (buckets / (x[-1] - x[0]))).astype(int)
+        bucket = numpy.minimum(bucket, buckets - 1)
+    else:
+        bucket = numpy.arange(n) * buckets // n
+    for b in numpy.unique(bucket):
+        kept = y[indices[bucket[indices] == b]]
+        assert kept.min() == y[bucket == b].min()
+        assert kept.max() == y[bucket == b].max()
+
+
+def testMinMaxKeepsEverything():
+    x, y = randomSeries(0, 10)
+    assert list(minMax(x, y, 5)) == list(range(10))
+    assert list(minMax(x, y, 0)) == list(range(10))
+
+
+def zigzag(seed, corners):
+    """Return a polyline with a collinear midpoint on every segment, and
+       the indices of its corners"""
+    random = numpy.random.RandomState(seed)
+    points = [(0, 0), (1, random.randint(1, 10))]
+    while len(points) < corners:
+        (ax, ay), (bx, by) = points[-2:]
+        cx, cy = bx + random.randint(1, 10), random.randint(-10, 10)
+        if (bx - ax) * (cy - ay) != (by - ay) * (cx - ax):
+            points.append((cx, cy))
+    x, y = numpy.array(points, dtype=float).T
+    # the midpoints are exact, so they are exactly on their segment
+    line = numpy.empty((2, 2 * corners - 1))
+    line[0, ::2], line[1, ::2] = x, y
+    line[0, 1::2], line[1, 1::2] = (x[1:] + x[:-1]) / 2, (y[1:] + y[:-1]) / 2
+    return line[0], line[1], numpy.arange(0, 2 * corners - 1, 2)
+
+
+@pytest.mark.parametrize('seed', range(10))
+def testDouglasPeuckerKeepsTheCorners(seed):
+    x, y, corners = zigzag(seed, 50)
+    assert list(douglasPeucker(x, y, 0.0)) == list(range(len(x)))
+    assert list(douglasPeucker(x, y, 1e-9)) == list(corners)
+
+
+@pytest.mark.parametrize('tolerance', [0.1, 1.0, 5.0])
+def testDouglasPeuckerTolerance(tolerance):
+    x, y = randomSeries(0, 2000)
+    indices = douglasPeucker(x, y, tolerance)
+    checkIndices(indices, len(x))
+    assert len(indices) < len(x)
+    for start, end in zip(indices[:-1], indices[1:]):
+        dx, dy = x[end] - x[start], y[end] - y[start]
+        px, py = x[start:end] - x[start], y[start:end] - y[start]
+        distance = numpy.abs(dx * py - dy * px) / numpy.hypot(dx, dy)
+        assert distance.max() <= tolerance
+
+
+def testDouglasPeuckerShortLines():
+    assert list(douglasPeucker(numpy.zeros(2), numpy.zeros(2), 1.0)) == [0, 1]
+    x = y = numpy.zeros(5)
+    assert list(douglasPeucker(x, y, 1.0)) == [0, 4]
@@ -0,0 +1,79 @@
+# This file is part of PyCha.
+#
+# PyCha is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyCha is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyCha.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy
+import pytest
+
+from sugarpycha.spatial import GridIndex
+
+
+def bruteForceQuery(x0, y0, x1, y1, x, y):
+    best, bestDistance = -1, None
+    for i in range(len(x0)):
+        if not (x0[i] <= x <= x1[i] and y0[i] <= y <= y1[i]):
+            continue
+        dx = (x0[i] + x1[i]) / 2 - x
+        dy = (y0[i] + y1[i]) / 2 - y
+        distance = dx ** 2 + dy ** 2
+        # ties go to the last box, which is drawn on top
+        if bestDistance is None or distance <= bestDistance:
+            best, bestDistance = i, distance
+    return best
+
+
+def randomBoxes(random, size):
+    # coordinates on a coarse lattice, so boxes share edges and centers
+    x0 = random.randint(0, 40, size) / 4.0
+    y0 = random.randint(0, 40, size) / 4.0
+    width = random.randint(0, 12, size) / 4.0
+    height = random.randint(0, 12, size) / 4.0
+    # some boxes have no width or no height, like the bars of zero
+    width[random.rand(size) < 0.15] = 0.0
+    height[random.rand(size) < 0.15] = 0.0
+    return x0, y0, x0 + width, y0 + height
+
+
+def queryPoints(random, x0, y0, x1, y1):
+    points = [(x, y) for x, y in random.uniform(-1.0, 14.0, (200, 2))]
+    for i in random.randint(0, len(x0), 50):
+        # corners, edge midpoints and centers of the boxes
+        for x in (x0[i], (x0[i] + x1[i]) / 2, x1[i]):
+            for y in (y0[i], (y0[i] + y1[i]) / 2, y1[i]):
+                points.append((x, y))
+    return points
+
+
+@pytest.mark.parametrize('seed', range(10))
+@pytest.mark.parametrize('size', [1, 7, 200])
+def testQueryMatchesBruteForce(seed, size):
+    random = numpy.random.RandomState(seed)
+    x0, y0, x1, y1 = randomBoxes(random, size)
+    index = GridIndex(x0, y0, x1, y1)
+    for x, y in queryPoints(random, x0, y0, x1, y1):
+        expected = bruteForceQuery(x0, y0, x1, y1, x, y)
+        assert index.query(x, y) == expected, (x, y)
+
+
+def testQueryZeroSizeBoxes():
+    x0 = y0 = x1 = y1 = numpy.array([1.0, 1.0, 2.0])
+    index = GridIndex(x0, y0, x1, y1)
+    assert index.query(1.0, 1.0) == 1
+    assert index.query(2.0, 2.0) == 2
+    assert index.query(1.5, 1.5) == -1
+
+
+def testQueryEmpty():
+    index = GridIndex([], [], [], [])
+    assert index.query(0.0, 0.0) == -1
@@ -0,0 +1,97 @@
+# This file is part of PyCha.
+#
+# PyCha is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# PyCha is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with PyCha.  If not, see <http://www.gnu.org/licenses/>.
+
+import pytest
+
+cairo = pytest.importorskip('cairo')
+
+from sugarpycha.stackedbar import StackedHorizontalBarChart
+from sugarpycha.stackedbar import StackedVerticalBarChart
+
+CHART_CLASSES = (StackedVerticalBarChart, StackedHorizontalBarChart)
+
+
+def renderBars(chartClass, values, items, mode):
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 200, 200)
+    chart = chartClass(surface, {'downsample': {'mode': mode}})
+    chart.addDataset([(name, [(i, value) for i in range(items)])
+                      for name, value in values])
+    chart.render()
+    return chart
+
+
+@pytest.mark.parametrize('chartClass', CHART_CLASSES)
+@pytest.mark.parametrize('values', [
+    [('a', 1.0), ('b', 2.0)],
+    [('a', -2.0), ('b', -3.0), ('c', 1.0)],
+    [('a', 0.7), ('b', -0.1), ('c', 0.2)],
+])
+def testEverySeriesSurvivesAggregation(chartClass, values):
+    chart = renderBars(chartClass, values, 5000, 'minmax')
+    assert chart.columns == 200
+    bars = chart.bars.split()
+    for name, value in values:
+        assert len(bars[name]) == chart.columns
+
+
+@pytest.mark.parametrize('chartClass', CHART_CLASSES)
+def testAggregatedBarsMatchTheItems(chartClass):
+    values = [('a', -2.0), ('b', -3.0), ('c', 1.0)]
+    items = renderBars(chartClass, values, 100, None).bars.split()
+    columns = renderBars(chartClass, values, 5000, 'minmax').bars.split()
+    for name, value in values:
+        item, column = items[name][0], columns[name][0]
+        if chartClass is StackedVerticalBarChart:
+            assert column.y == pytest.approx(item.y)
+            assert column.h == pytest.approx(item.h)
+        else:
+            assert column.x == pytest.approx(item.x)
+            assert column.w == pytest.approx(item.w)
+
+
+@pytest.mark.parametrize('chartClass', CHART_CLASSES)
+def testAggregatedStacksFillTheAxis(chartClass):
+    # the axis goes from the lowest negative stack to the highest
+    # positive one, the bars must reach both ends and no further
+    values = [('a', -2.0), ('b', 3.0), ('c', -1.0), ('d', 0.5)]
+    chart = renderBars(chartClass, values, 5000, 'minmax')
+    assert (chart.minyval, chart.maxyval) == (-3.0, 3.5)
+    bars = chart.bars
+    if chartClass is StackedVerticalBarChart:
+        start, end = bars.y, bars.y + bars.h
+    else:
+        start, end = bars.x, bars.x + bars.w
+    assert start.min() == pytest.approx(0.0)
+    assert end.max() == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize('chartClass', CHART_CLASSES)
+@pytest.mark.parametrize('series', [
+    # interleaved series, every column holds a 0 and a 10 of each
+    [('a', lambda i: 10.0 * (i % 2)), ('b', lambda i: 10.0 * (1 - i % 2))],
+    [('a', lambda i: (-1) ** i * (i % 7)), ('b', lambda i: (i % 5) - 2.0),
+     ('c', lambda i: 3.0 * (-1) ** (i // 3))],
+])
+def testEnvelopeBoundsStayInside(chartClass, series):
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 200, 200)
+    chart = chartClass(surface, {'downsample': {'mode': 'minmax'}})
+    chart.addDataset([(name, [(i, value(i)) for i in range(5000)])
+                      for name, value in series])
+    chart.render()
+    assert chart.columns
+    for bar in chart.bars:
+        x, y, w, h = bar.bounds
+        assert 0.0 <= x <= x + w <= 1.0
+        assert 0.0 <= y <= y + h <= 1.0
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+import io
+import os
+import struct
+import zlib
+
+import numpy
+import pytest
+
+pytest.importorskip('cairo')
+
+from tiledrender import PNGWriter, _adler32_combine, compress_rows
+
+
+def read_chunks(data):
+    '''Return the (kind, data) chunks of a PNG file, checking the CRCs'''
+    assert data[:8] == b'\x89PNG\r\n\x1a\n'
+    chunks = []
+    offset = 8
+    while offset < len(data):
+        length, = struct.unpack('>I', data[offset:offset + 4])
+        kind = data[offset + 4:offset + 8]
+        body = data[offset + 8:offset + 8 + length]
+        crc, = struct.unpack('>I', data[offset + 8 + length:
+                                        offset + 12 + length])
+        assert crc == zlib.crc32(kind + body)
+        chunks.append((kind, body))
+        offset += 12 + length
+    return chunks
+
+
+@pytest.mark.parametrize('width, height, tile_size', [
+    (1, 1, 1),
+    (37, 50, 16),
+    (300, 64, 64),
+    (5, 1000, 333),
+])
+def test_bands_make_one_zlib_stream(width, height, tile_size):
+    random = numpy.random.RandomState(width * height)
+    rows = random.randint(0, 256, (height, 1 + width * 4)).astype(numpy.uint8)
+    rows[:, 0] = 0
+
+    f = io.BytesIO()
+    writer = PNGWriter(f, width, height)
+    for top in range(0, height, tile_size):
+        writer.write(compress_rows(rows[top:top + tile_size]))
+    writer.close()
+
+    chunks = read_chunks(f.getvalue())
+    kinds = [kind for kind, body in chunks]
+    assert kinds[0] == b'IHDR' and kinds[-1] == b'IEND'
+    assert set(kinds[1:-1]) == {b'IDAT'}
+    assert chunks[0][1] == struct.pack('>IIBBBBB', width, height,
+                                       8, 6, 0, 0, 0)
+    stream = b''.join(body for kind, body in chunks if kind == b'IDAT')
+    # zlib checks the Adler-32 at the end of the stream as well
+    assert zlib.decompress(stream) == rows.tobytes()
+
+
+@pytest.mark.parametrize('length_a, length_b', [
+    (0, 0), (10, 0), (0, 10), (1, 1), (1000, 37), (70000, 140000),
+])
+def test_adler32_combine(length_a, length_b):
+    a, b = os.urandom(length_a), os.urandom(length_b)
+    combined = _adler32_combine(zlib.adler32(a), zlib.adler32(b), len(b))
+    assert combined == zlib.adler32(a + b)
+
+
+def test_adler32_combine_bytes_of_ones():
+    # the sums wrap around the modulus with the biggest byte values
+    a, b = b'\xff' * 100000, b'\xff' * 65521
+    combined = _adler32_combine(zlib.adler32(a), zlib.adler32(b), len(b))
+    assert combined == zlib.adler32(a + b)
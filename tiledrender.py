@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA  02110-1301  USA
+
+'''Rendering of big PNG images in tiles.
+
+The image is drawn in bands one tile high. Each tile of a band is drawn
+on its own small surface, the band is converted to PNG rows and
+compressed, and the compressed band is appended to the file. Only one
+band of rows is in memory at a time, per process.
+
+Bands are compressed as independent deflate blocks, so they can be drawn
+and compressed by worker processes and still make one zlib stream.
+'''
+
+import multiprocessing
+import struct
+import zlib
+
+import cairo
+import numpy
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+_ADLER_BASE = 65521
+
+# sugarpycha chart of the process and the image size, set by _init_worker
+_worker = None
+
+
+class PNGWriter(object):
+    '''Writes a RGBA PNG image to a file object band by band'''
+
+    def __init__(self, file, width, height):
+        self.file = file
+        self.adler = 1
+        self.file.write(_PNG_SIGNATURE)
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height,
+                                         8, 6, 0, 0, 0))
+        # zlib header of the image data, deflate with a 32K window
+        self._chunk(b'IDAT', b'\x78\x9c')
+
+    def write(self, band):
+        '''Appends a band made by compress_rows'''
+        data, adler, length = band
+        self.adler = _adler32_combine(self.adler, adler, length)
+        self._chunk(b'IDAT', data)
+
+    def close(self):
+        # an empty final deflate block and the checksum end the stream
+        end = zlib.compressobj(9, zlib.DEFLATED, -15).flush()
+        self._chunk(b'IDAT', end + struct.pack('>I', self.adler))
+        self._chunk(b'IEND', b'')
+
+    def _chunk(self, kind, data):
+        self.file.write(struct.pack('>I', len(data)))
+        self.file.write(kind)
+        self.file.write(data)
+        self.file.write(struct.pack('>I', zlib.crc32(kind + data)))
+
+
+def compress_rows(rows, level=6):
+    '''Return (data, adler32, length) of PNG rows, any bytes-like object,
+       compressed as deflate blocks that don't end the stream'''
+    rows = memoryview(rows).cast('B')
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    data = compressor.compress(rows) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    return data, zlib.adler32(rows), len(rows)
+
+
+def _adler32_combine(adler1, adler2, length2):
+    '''Return the adler32 of two byte strings from their adler32s'''
+    remainder = length2 % _ADLER_BASE
+    low1, high1 = adler1 & 0xffff, adler1 >> 16
+    low2, high2 = adler2 & 0xffff, adler2 >> 16
+    sum1 = low1 + low2 + _ADLER_BASE - 1
+    sum2 = remainder * low1 + high1 + high2 + _ADLER_BASE - remainder
+    return (sum1 % _ADLER_BASE) | ((sum2 % _ADLER_BASE) << 16)
+
+
+def surface_to_rgba(surface, width, height):
+    '''Return the pixels of an ARGB32 surface as a (height, width, 4) array
+       of straight (not premultiplied) RGBA bytes'''
+    surface.flush()
+    pixels = numpy.frombuffer(surface.get_data(), dtype=numpy.uint32)
+    pixels = pixels.reshape(height, surface.get_stride() // 4)[:, :width]
+    alpha = pixels >> 24
+    divisor = numpy.maximum(alpha, 1)
+    rgba = numpy.empty((height, width, 4), dtype=numpy.uint8)
+    for index, shift in enumerate((16, 8, 0)):
+        color = (pixels >> shift) & 0xff
+        rgba[..., index] = (color * 255 + alpha // 2) // divisor
+    rgba[..., 3] = alpha
+    return rgba
+
+
+def _init_worker(chart_class, options, datasets, width, height, tile_size):
+    global _worker
+    chart = chart_class(None, options)
+    chart.addDataset(datasets)
+    _worker = (chart, width, height, tile_size)
+
+
+def render_band(top):
+    '''Draw the band of tiles that starts at row top, return it compressed'''
+    chart, width, height, tile_size = _worker
+    band_height = min(tile_size, height - top)
+    # every row starts with its filter type, 0 (none)
+    rows = numpy.zeros((band_height, 1 + width * 4), dtype=numpy.uint8)
+    for left in range(0, width, tile_size):
+        tile_width = min(tile_size, width - left)
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32,
+                                     tile_width, band_height)
+        chart.renderTile(surface, left, top, width, height)
+        rgba = surface_to_rgba(surface, tile_width, band_height)
+        rows[:, 1 + left * 4:1 + (left + tile_width) * 4] = \
+            rgba.reshape(band_height, tile_width * 4)
+    return compress_rows(rows)
+
+
+def write_png(file, chart_class, options, datasets, width, height,
+              tile_size=1024, processes=1):
+    '''Write a width x height PNG image of a sugarpycha chart to file.
+
+       chart_class, options and datasets are what the chart is built with.
+       With more than one process the bands are drawn by a pool of worker
+       processes; they are written in order as they are done.'''
+    global _worker
+    init_args = (chart_class, options, datasets, width, height, tile_size)
+    bands = range(0, height, tile_size)
+    writer = PNGWriter(file, width, height)
+    if processes > 1:
+        with multiprocessing.Pool(processes, _init_worker, init_args) as pool:
+            for band in pool.imap(render_band, bands):
+                writer.write(band)
+    else:
+        _init_worker(*init_args)
+        try:
+            for band in map(render_band, bands):
+                writer.write(band)
+        finally:
+            _worker = None
+    writer.close()